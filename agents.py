@@ -1,43 +1,167 @@
+from collections import OrderedDict
 from typing import Any
+import asyncio
+import hashlib
 import re
-import json
 import logging
-from pydantic import BaseModel
+import time
+import orjson
 
 logger = logging.getLogger("negotiation.agents")
 
+# Hot per-turn statements. Keeping one text per statement lets asyncpg reuse
+# its per-connection prepared statement instead of parsing a new query string.
+SELECT_HISTORY_SQL = (
+    "SELECT role, message_text, message_timestamp FROM message "
+    "WHERE ng_id = $1 AND supplier_id = $2 ORDER BY message_timestamp"
+)
+SELECT_HISTORY_SINCE_SQL = (
+    "SELECT role, message_text, message_timestamp FROM message "
+    "WHERE ng_id = $1 AND supplier_id = $2 AND message_timestamp > $3 "
+    "ORDER BY message_timestamp"
+)
+SELECT_INSTRUCTIONS_SQL = (
+    "SELECT instructions FROM instructions WHERE ng_id = $1 AND supplier_id = $2"
+)
+INSERT_MESSAGE_SQL = (
+    "INSERT INTO message (ng_id, supplier_id, role, message_text) "
+    "VALUES ($1, $2, $3, $4)"
+)
+UPSERT_INSTRUCTIONS_SQL = """
+    INSERT INTO instructions (supplier_id, ng_id, instructions)
+    VALUES ($1, $2, $3)
+    ON CONFLICT (supplier_id, ng_id)
+    DO UPDATE SET instructions = EXCLUDED.instructions
+"""
+
+# Flag the most recent message of a finished conversation as completed.
+MARK_COMPLETED_SQL = """
+    UPDATE message
+    SET completed = TRUE
+    WHERE ng_id = $1 AND supplier_id = $2
+    AND message_id = (
+        SELECT message_id FROM message
+        WHERE ng_id = $1 AND supplier_id = $2
+        ORDER BY message_timestamp DESC
+        LIMIT 1
+    )
+"""
+
+# Most recent turns per supplier included in the orchestrator prompt; older
+# turns are already reflected in that supplier's current instructions.
+ORCHESTRATOR_HISTORY_TURNS = 20
+
+# One row per supplier: its latest $2 turns as a chronological JSON array plus
+# the current instructions (the join is 1:1 per message thanks to the PK).
+SELECT_SUPPLIER_CONTEXT_SQL = """
+    SELECT m.supplier_id,
+           json_agg(
+               json_build_object(
+                   'role', m.role,
+                   'text', m.message_text,
+                   'timestamp', m.message_timestamp
+               )
+               ORDER BY m.message_timestamp
+           ) AS msgs,
+           max(i.instructions) AS instructions
+    FROM (
+        SELECT ng_id, supplier_id, role, message_text, message_timestamp,
+               row_number() OVER (
+                   PARTITION BY supplier_id ORDER BY message_timestamp DESC
+               ) AS turn
+        FROM message
+        WHERE ng_id = $1 AND supplier_id IS NOT NULL
+    ) m
+    LEFT JOIN instructions i
+           ON i.ng_id = m.ng_id AND i.supplier_id = m.supplier_id
+    WHERE m.turn <= $2
+    GROUP BY m.supplier_id
+"""
+
+_INSTRUCTION_RE = re.compile(
+    r"\[INSTRUCTION\]\s*"
+    r"ng_id:\s*(?P<ng_id>\S+)\s*"
+    r"supplier_id:\s*(?P<supplier_id>\S+)\s*"
+    r"completed:\s*(?P<completed>\S+)\s*"
+    r"text:\s*(?P<text>.*?)"
+    r"\[/INSTRUCTION\]",
+    re.DOTALL | re.IGNORECASE,
+)
+_UUID_RE = re.compile(
+    r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\Z", re.IGNORECASE
+)
+
+
+_REASONING_RE = re.compile(
+    r"<(thinking|reasoning|scratchpad|think|reflection|internal|analysis)>.*?</\1>",
+    re.DOTALL | re.IGNORECASE,
+)
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+
 
 def strip_reasoning_tokens(text: str) -> str:
     """
     Remove reasoning/thinking tokens from model output before sending to email.
     Handles common patterns like <thinking>, <reasoning>, <scratchpad>, etc.
     """
-    # Remove content within common reasoning tags
-    patterns = [
-        r"<thinking>.*?</thinking>",
-        r"<reasoning>.*?</reasoning>",
-        r"<scratchpad>.*?</scratchpad>",
-        r"<think>.*?</think>",
-        r"<reflection>.*?</reflection>",
-        r"<internal>.*?</internal>",
-        r"<analysis>.*?</analysis>",
-    ]
-
-    result = text
-    for pattern in patterns:
-        result = re.sub(pattern, "", result, flags=re.DOTALL | re.IGNORECASE)
+    # Remove content within common reasoning tags in a single pass; most
+    # replies are plain prose, so skip the regex when there is no tag at all
+    result = _REASONING_RE.sub("", text) if "<" in text else text
 
     # Clean up extra whitespace left behind
-    result = re.sub(r"\n{3,}", "\n\n", result)
-    result = result.strip()
+    if "\n\n\n" in result:
+        result = _BLANK_LINES_RE.sub("\n\n", result)
+    return result.strip()
 
-    return result
 
+MODEL_ID = "openai.gpt-oss-120b-1:0"
 
-class Message(BaseModel):
-    role: str
-    content: str
-    timestamp: str | None = None
+
+def _invoke_model_sync(client: Any, payload: bytes) -> str:
+    response = client.invoke_model(
+        modelId=MODEL_ID,
+        contentType="application/json",
+        accept="application/json",
+        body=payload,
+    )
+    result = orjson.loads(response["body"].read())
+    return result["choices"][0]["message"]["content"]
+
+
+# Exact-match reply cache for deterministic-enough calls (summaries), keyed by
+# a hash of the request body. Negotiation turns never opt in. Entries expire so
+# a long-running process doesn't keep serving a reply forever.
+_RESPONSE_CACHE: OrderedDict[str, tuple[float, str]] = OrderedDict()
+_RESPONSE_CACHE_SIZE = 256
+_RESPONSE_CACHE_TTL = 600.0
+
+
+async def invoke_model(client: Any, body: dict[str, Any], cache: bool = False) -> str:
+    """
+    Call the Bedrock model and return the reply text.
+    boto3 is synchronous, so the request and the body read run in a worker
+    thread to keep the event loop free for other negotiations.
+    With cache=True an identical earlier request is answered from memory.
+    """
+    # Encoded once; the same bytes are sent and hashed for the cache key
+    payload = orjson.dumps(body)
+    if not cache:
+        return await asyncio.to_thread(_invoke_model_sync, client, payload)
+
+    key = hashlib.sha256(payload).hexdigest()
+    cached = _RESPONSE_CACHE.get(key)
+    if cached is not None:
+        expires, reply = cached
+        if expires > time.monotonic():
+            _RESPONSE_CACHE.move_to_end(key)
+            return reply
+        del _RESPONSE_CACHE[key]
+
+    reply = await asyncio.to_thread(_invoke_model_sync, client, payload)
+    _RESPONSE_CACHE[key] = (time.monotonic() + _RESPONSE_CACHE_TTL, reply)
+    if len(_RESPONSE_CACHE) > _RESPONSE_CACHE_SIZE:
+        _RESPONSE_CACHE.popitem(last=False)
+    return reply
 
 
 class NegotiationAgent:
@@ -64,6 +188,43 @@ class NegotiationAgent:
         self.supplier_email = supplier_email
         self.supplier_name = supplier_name
         self.supplier_insights = supplier_insights
+        # The system prompt never changes for an agent, so build its message once.
+        self._prefix: list[dict[str, str]] = (
+            [{"role": "system", "content": sys_prompt}] if sys_prompt else []
+        )
+        # Sanitized once for subject lines; the product never changes
+        self._clean_product = " ".join(
+            product.replace("\n", " ").replace("\r", " ").split()
+        )
+        # History is append-only, so keep what we've already loaded and only
+        # fetch rows newer than the last timestamp seen on later turns.
+        self._history: list[dict[str, str]] = []
+        self._history_ts: Any = None
+
+    async def _save_reply(self, reply: str) -> None:
+        logger.info(f"[Agent {self.ng_id}:{self.sup_id}] Saving message to database...")
+        await self.db_pool.execute(
+            INSERT_MESSAGE_SQL,
+            self.ng_id,
+            self.sup_id,
+            "negotiator",
+            reply,
+        )
+        logger.info(f"[Agent {self.ng_id}:{self.sup_id}] Message saved to database")
+
+    async def _email_reply(self, reply: str, subject: str) -> None:
+        if not (self.email_client and self.supplier_email):
+            logger.warning(
+                f"[Agent {self.ng_id}:{self.sup_id}] Email not sent - no email client or supplier email configured"
+            )
+            return
+        logger.info(
+            f"[Agent {self.ng_id}:{self.sup_id}] Sending email to {self.supplier_email}..."
+        )
+        # Strip reasoning tokens before sending email
+        email_body = strip_reasoning_tokens(reply)
+        await self.email_client.email_send(self.supplier_email, subject, email_body)
+        logger.info(f"[Agent {self.ng_id}:{self.sup_id}] Email sent successfully")
 
     def _map_role(self, db_role: str) -> str:
         """Map database roles to API-compatible roles."""
@@ -77,22 +238,25 @@ class NegotiationAgent:
         return role_mapping.get(db_role, "user")
 
     async def _build_conversation(self) -> list[dict[str, str]]:
-        conversation: list[dict[str, str]] = []
-        if self.sys_prompt:
-            conversation.append({"role": "system", "content": self.sys_prompt})
-        messages = await self.db_pool.fetch(
-            "SELECT * FROM message WHERE ng_id = $1 AND supplier_id = $2 ORDER BY message_timestamp",
-            self.ng_id,
-            self.sup_id,
+        if self._history_ts is None:
+            history_query = self.db_pool.fetch(
+                SELECT_HISTORY_SQL, self.ng_id, self.sup_id
+            )
+        else:
+            history_query = self.db_pool.fetch(
+                SELECT_HISTORY_SINCE_SQL, self.ng_id, self.sup_id, self._history_ts
+            )
+        # History and instructions are independent, so fetch them concurrently
+        messages, instructions = await asyncio.gather(
+            history_query,
+            self.db_pool.fetch(SELECT_INSTRUCTIONS_SQL, self.ng_id, self.sup_id),
         )
         for message in messages:
             api_role = self._map_role(message["role"])
-            conversation.append({"role": api_role, "content": message["message_text"]})
-        instructions = await self.db_pool.fetch(
-            "SELECT * FROM instructions WHERE ng_id = $1 AND supplier_id = $2",
-            self.ng_id,
-            self.sup_id,
-        )
+            self._history.append({"role": api_role, "content": message["message_text"]})
+            self._history_ts = message["message_timestamp"]
+
+        conversation = self._prefix + self._history
         for instruction in instructions:
             conversation.append(
                 {
@@ -111,9 +275,7 @@ class NegotiationAgent:
             f"[Agent {self.ng_id}:{self.sup_id}] Preparing initial message for product: {self.product}"
         )
 
-        conversation: list[dict[str, str]] = []
-        if self.sys_prompt:
-            conversation.append({"role": "system", "content": self.sys_prompt})
+        conversation = list(self._prefix)
 
         # Build insights section if available
         insights_section = ""
@@ -149,52 +311,19 @@ Address the supplier by name ({self.supplier_name}) in your message."""
 
         logger.info(f"[Agent {self.ng_id}:{self.sup_id}] Calling Bedrock model...")
         try:
-            response = self.client.invoke_model(
-                modelId="openai.gpt-oss-120b-1:0",
-                contentType="application/json",
-                accept="application/json",
-                body=json.dumps(body),
-            )
+            reply = await invoke_model(self.client, body)
         except Exception as e:
             logger.error(f"[Agent {self.ng_id}:{self.sup_id}] Bedrock call failed: {e}")
             return f"Bedrock service is currently unavailable. {e}"
 
-        result = json.loads(response["body"].read())
-        reply = result["choices"][0]["message"]["content"]
         logger.info(
             f"[Agent {self.ng_id}:{self.sup_id}] Bedrock response received ({len(reply)} chars)"
         )
 
-        # Save the initial message to DB
-        logger.info(f"[Agent {self.ng_id}:{self.sup_id}] Saving message to database...")
-        await self.db_pool.execute(
-            "INSERT INTO message (ng_id, supplier_id, role, message_text) VALUES ($1, $2, $3, $4)",
-            self.ng_id,
-            self.sup_id,
-            "negotiator",
-            reply,
-        )
-        logger.info(f"[Agent {self.ng_id}:{self.sup_id}] Message saved to database")
-
-        # Send via email if configured
-        if self.email_client and self.supplier_email:
-            logger.info(
-                f"[Agent {self.ng_id}:{self.sup_id}] Sending email to {self.supplier_email}..."
-            )
-            # Strip reasoning tokens before sending email
-            email_body = strip_reasoning_tokens(reply)
-            # Sanitize product name for subject line
-            clean_product = " ".join(
-                self.product.replace("\n", " ").replace("\r", " ").split()
-            )
-            # Include supplier name and ref IDs in subject for tracking replies
-            subject = f"[{self.supplier_name}] [REF-{self.ng_id[:8]}-{self.sup_id[9:23]}] Inquiry about {clean_product}"
-            await self.email_client.email_send(self.supplier_email, subject, email_body)
-            logger.info(f"[Agent {self.ng_id}:{self.sup_id}] Email sent successfully")
-        else:
-            logger.warning(
-                f"[Agent {self.ng_id}:{self.sup_id}] Email not sent - no email client or supplier email configured"
-            )
+        # Only email a reply that made it into the stored conversation
+        subject = f"[{self.supplier_name}] [REF-{self.ng_id[:8]}-{self.sup_id[9:23]}] Inquiry about {self._clean_product}"
+        await self._save_reply(reply)
+        await self._email_reply(reply, subject)
 
         return reply
 
@@ -217,55 +346,20 @@ Address the supplier by name ({self.supplier_name}) in your message."""
 
         logger.info(f"[Agent {self.ng_id}:{self.sup_id}] Calling Bedrock model...")
         try:
-            response = self.client.invoke_model(
-                modelId="openai.gpt-oss-120b-1:0",
-                contentType="application/json",
-                accept="application/json",
-                body=json.dumps(body),
-            )
+            reply = await invoke_model(self.client, body)
         except Exception as e:
             logger.error(f"[Agent {self.ng_id}:{self.sup_id}] Bedrock call failed: {e}")
             return f"Bedrock service is currently unavailable. {e}"
 
-        result = json.loads(response["body"].read())
-        reply = result["choices"][0]["message"]["content"]
         # Strip reasoning tokens before saving and sending
         reply = strip_reasoning_tokens(reply)
         logger.info(
             f"[Agent {self.ng_id}:{self.sup_id}] Bedrock response received ({len(reply)} chars)"
         )
 
-        Message(role="assistant", content=reply)
-
-        logger.info(f"[Agent {self.ng_id}:{self.sup_id}] Saving message to database...")
-        await self.db_pool.execute(
-            "INSERT INTO message (ng_id, supplier_id, role, message_text) VALUES ($1, $2, $3, $4)",
-            self.ng_id,
-            self.sup_id,
-            "negotiator",
-            reply,
-        )
-        logger.info(f"[Agent {self.ng_id}:{self.sup_id}] Message saved to database")
-
-        # Send via email if configured
-        if self.email_client and self.supplier_email:
-            logger.info(
-                f"[Agent {self.ng_id}:{self.sup_id}] Sending email to {self.supplier_email}..."
-            )
-            # Strip reasoning tokens before sending email
-            email_body = strip_reasoning_tokens(reply)
-            # Sanitize product name for subject line
-            clean_product = " ".join(
-                self.product.replace("\n", " ").replace("\r", " ").split()
-            )
-            # Include supplier name and ref IDs in subject for tracking replies
-            subject = f"Re: [{self.supplier_name}] [REF-{self.ng_id[:8]}-{self.sup_id[9:23]}] {clean_product} negotiation"
-            await self.email_client.email_send(self.supplier_email, subject, email_body)
-            logger.info(f"[Agent {self.ng_id}:{self.sup_id}] Email sent successfully")
-        else:
-            logger.warning(
-                f"[Agent {self.ng_id}:{self.sup_id}] Email not sent - no email client or supplier email configured"
-            )
+        subject = f"Re: [{self.supplier_name}] [REF-{self.ng_id[:8]}-{self.sup_id[9:23]}] {self._clean_product} negotiation"
+        await self._save_reply(reply)
+        await self._email_reply(reply, subject)
 
         return reply
 
@@ -274,19 +368,22 @@ class OrchestratorAgent:
     def __init__(
         self,
         db_pool: Any,
-        sys_promt: str,
+        sys_prompt: str,
         strategy: str,
         product: str,
         ng_id: str,
         client: Any,
     ) -> None:
         self.db_pool = db_pool
-        self.sys_prompt = sys_promt
+        self.sys_prompt = sys_prompt
         self.strategy = strategy
         self.product = product
         self.client = client
         self.ng_id = ng_id
-        return
+        self._prefix: list[dict[str, str]] = []
+        if sys_prompt:
+            self._prefix.append({"role": "system", "content": sys_prompt})
+        self._prefix.append({"role": "user", "content": strategy})
 
     @staticmethod
     def _summarize_text(text: str, limit: int = 80) -> str:
@@ -301,11 +398,12 @@ class OrchestratorAgent:
         supplier_id: str,
         instructions_text: str,
         completed: bool,
+        conn: Any = None,
     ) -> None:
         """Upsert a single activity row per (ng_id, supplier_id), incrementing change_count."""
         action = "completed" if completed else "updated"
         summary = self._summarize_text(instructions_text)
-        await self.db_pool.execute(
+        await (conn or self.db_pool).execute(
             """
             INSERT INTO orchestrator_activity (ng_id, supplier_id, action, summary, details, completed, change_count)
             VALUES ($1, $2, $3, $4, $5, $6, 1)
@@ -374,14 +472,7 @@ Conversation history:
         }
 
         try:
-            response = self.client.invoke_model(
-                modelId="openai.gpt-oss-120b-1:0",
-                contentType="application/json",
-                accept="application/json",
-                body=json.dumps(body),
-            )
-            result = json.loads(response["body"].read())
-            summary_text = result["choices"][0]["message"]["content"]
+            summary_text = await invoke_model(self.client, body, cache=True)
             summary_text = strip_reasoning_tokens(summary_text)
             return summary_text.strip()
         except Exception as exc:  # pragma: no cover - best effort
@@ -390,6 +481,23 @@ Conversation history:
             )
             return fallback_text
 
+    async def _summarize_completed(
+        self,
+        supplier_id: str,
+        messages: list[dict[str, Any]],
+        fallback_text: str,
+    ) -> None:
+        """Generate and persist the final summary for a completed supplier (best effort)."""
+        try:
+            summary_text = await self._generate_completion_summary(
+                supplier_id, messages, fallback_text
+            )
+            await self._save_summary(supplier_id, summary_text)
+        except Exception as summary_error:  # pragma: no cover - best effort
+            logger.warning(
+                f"[Orchestrator {self.ng_id}] Failed to save summary for supplier {supplier_id}: {summary_error}"
+            )
+
     async def _save_summary(self, supplier_id: str, summary_text: str) -> None:
         agent_row = await self.db_pool.fetchrow(
             "SELECT agent_id FROM agent WHERE ng_id = $1 AND sup_id = $2",
@@ -416,17 +524,17 @@ Conversation history:
         )
 
     async def _build_conversation(self) -> list[dict[str, str]]:
-        conversation: list[dict[str, str]] = []
-        if self.sys_prompt:
-            conversation.append({"role": "system", "content": self.sys_prompt})
-        conversation.append({"role": "user", "content": self.strategy})
+        conversation = list(self._prefix)
 
         messages = await self.db_pool.fetch(
-            "SELECT * FROM message WHERE ng_id = $1 AND supplier_id IS NULL",
+            "SELECT role, message_text FROM message "
+            "WHERE ng_id = $1 AND supplier_id IS NULL ORDER BY message_timestamp",
             self.ng_id,
         )
         for message in messages:
-            conversation.append({"role": message.role, "content": message.content})
+            conversation.append(
+                {"role": message["role"], "content": message["message_text"]}
+            )
         return conversation
 
     async def generate_new_instructions(self) -> dict[str, bool]:
@@ -440,63 +548,49 @@ Conversation history:
         """
         logger.info(f"[Orchestrator {self.ng_id}] Generating new instructions...")
 
-        # 1. Fetch messages for THIS negotiation only
-        all_messages = await self.db_pool.fetch(
-            "SELECT ng_id, supplier_id, role, message_text, message_timestamp "
-            "FROM message WHERE ng_id = $1 ORDER BY message_timestamp",
-            self.ng_id,
+        # 1. Fetch supplier histories for THIS negotiation, grouped server-side
+        #    with each supplier's current instructions joined in, alongside the
+        #    orchestrator's own conversation (independent reads, run together)
+        supplier_rows, conversation = await asyncio.gather(
+            self.db_pool.fetch(
+                SELECT_SUPPLIER_CONTEXT_SQL, self.ng_id, ORCHESTRATOR_HISTORY_TURNS
+            ),
+            self._build_conversation(),
         )
-        logger.info(f"[Orchestrator {self.ng_id}] Found {len(all_messages)} messages")
 
-        # 2. Group messages by supplier_id
+        # 2. Index histories and existing instructions by supplier_id
         grouped: dict[str, list[dict[str, Any]]] = {}
-        for row in all_messages:
-            sup_id = str(row["supplier_id"]) if row["supplier_id"] else "orchestrator"
-            if sup_id not in grouped:
-                grouped[sup_id] = []
-            grouped[sup_id].append(
-                {
-                    "supplier_id": sup_id,
-                    "role": row["role"],
-                    "text": row["message_text"],
-                    "timestamp": row["message_timestamp"].isoformat()
-                    if row["message_timestamp"]
-                    else None,
-                }
-            )
-
-        # 3. Fetch existing instructions for THIS negotiation
         existing_instructions: dict[str, str] = {}  # supplier_id -> instructions
-        instr_rows = await self.db_pool.fetch(
-            "SELECT supplier_id, instructions FROM instructions WHERE ng_id = $1",
-            self.ng_id,
-        )
-        for row in instr_rows:
+        for row in supplier_rows:
             sup_id = str(row["supplier_id"])
-            existing_instructions[sup_id] = row["instructions"]
-
-        # 4. Build the orchestrator prompt
-        conversation = await self._build_conversation()
+            grouped[sup_id] = orjson.loads(row["msgs"])
+            if row["instructions"] is not None:
+                existing_instructions[sup_id] = row["instructions"]
+        logger.info(
+            f"[Orchestrator {self.ng_id}] Found history for {len(grouped)} supplier(s)"
+        )
 
+        # 3. Build the orchestrator prompt
         # Build context for each supplier in this negotiation
         agent_context_parts = []
         valid_pairs = []
 
         for sup_id, messages in grouped.items():
-            if sup_id == "orchestrator":
-                continue  # Skip orchestrator messages
-
-            part = f"## Supplier: {sup_id}\n"
+            parts = [f"## Supplier: {sup_id}\n"]
             valid_pairs.append(f"  - ng_id: {self.ng_id}, supplier_id: {sup_id}")
 
             # Include existing instructions if any
             if sup_id in existing_instructions:
-                part += f"### Current Instructions:\n{existing_instructions[sup_id]}\n"
+                parts.append(
+                    f"### Current Instructions:\n{existing_instructions[sup_id]}\n"
+                )
 
-            part += "### Message History (chronological):\n"
-            for msg in messages:
-                part += f"[{msg['timestamp']}] {msg['role']}: {msg['text']}\n"
-            agent_context_parts.append(part)
+            parts.append("### Message History (chronological):\n")
+            parts.extend(
+                f"[{msg['timestamp']}] {msg['role']}: {msg['text']}\n"
+                for msg in messages
+            )
+            agent_context_parts.append("".join(parts))
 
         full_context = "\n\n".join(agent_context_parts)
         valid_pairs_str = "\n".join(valid_pairs)
@@ -544,129 +638,105 @@ RULES:
             }
         )
 
-        # 5. Call the model
+        # 4. Call the model
         body = {
             "messages": conversation,
             "max_tokens": 1024,
             "temperature": 0.7,
         }
         try:
-            response = self.client.invoke_model(
-                modelId="openai.gpt-oss-120b-1:0",
-                contentType="application/json",
-                accept="application/json",
-                body=json.dumps(body),
-            )
+            reply = await invoke_model(self.client, body)
         except Exception as e:
             raise RuntimeError(f"Bedrock service is currently unavailable: {e}")
 
-        result = json.loads(response["body"].read())
-        reply = result["choices"][0]["message"]["content"]
-
-        # 6. Parse the model response using regex for [INSTRUCTION] blocks
-        pattern = re.compile(
-            r"\[INSTRUCTION\]\s*"
-            r"ng_id:\s*(?P<ng_id>[^\n]+)\s*"
-            r"supplier_id:\s*(?P<supplier_id>[^\n]+)\s*"
-            r"completed:\s*(?P<completed>[^\n]+)\s*"
-            r"text:\s*(?P<text>.*?)"
-            r"\[/INSTRUCTION\]",
-            re.DOTALL | re.IGNORECASE,
-        )
-
-        matches = pattern.findall(reply)
+        # 5. Parse the model response using regex for [INSTRUCTION] blocks
+        matches = list(_INSTRUCTION_RE.finditer(reply))
         if not matches:
             logger.warning(f"No valid [INSTRUCTION] blocks found in response:\n{reply}")
             return {}
 
-        # 7. Upsert instructions for each agent and mark completion if needed
-        import uuid as uuid_module
-
+        # 6. Upsert instructions for each agent and mark completion if needed
         completion_status: dict[str, bool] = {}
+        # Keyed by (ng_id, supplier_id) so a block the model repeats yields one
+        # write; the last occurrence wins, as it would with sequential upserts.
+        accepted_by_key: dict[tuple[str, str], tuple[str, str, str, bool]] = {}
 
         for match in matches:
-            parsed_ng_id = match[0].strip()
-            parsed_supplier_id = match[1].strip()
-            completed_str = match[2].strip().lower()
-            instructions_text = match[3].strip()
+            parsed_ng_id = match.group("ng_id").strip()
+            parsed_supplier_id = match.group("supplier_id").strip()
+            completed_str = match.group("completed").strip().lower()
+            instructions_text = match.group("text").strip()
 
             is_completed = completed_str in ("true", "yes", "1")
 
-            if not all([parsed_ng_id, parsed_supplier_id, instructions_text]):
+            if not (parsed_ng_id and parsed_supplier_id and instructions_text):
                 logger.warning(f"Skipping incomplete instruction block")
                 continue
 
             # Validate UUIDs before inserting
-            try:
-                uuid_module.UUID(parsed_ng_id)
-                uuid_module.UUID(parsed_supplier_id)
-            except ValueError:
+            if not (
+                _UUID_RE.match(parsed_ng_id) and _UUID_RE.match(parsed_supplier_id)
+            ):
                 logger.warning(
                     f"Skipping invalid UUIDs: ng_id={parsed_ng_id}, supplier_id={parsed_supplier_id}"
                 )
                 continue
 
             completion_status[parsed_supplier_id] = is_completed
-
+            accepted_by_key[(parsed_ng_id, parsed_supplier_id)] = (
+                parsed_ng_id,
+                parsed_supplier_id,
+                instructions_text,
+                is_completed,
+            )
             logger.info(
                 f"Upserting instruction for ng_id={parsed_ng_id}, supplier_id={parsed_supplier_id}, completed={is_completed}"
             )
-            await self.db_pool.execute(
-                """
-                INSERT INTO instructions (supplier_id, ng_id, instructions)
-                VALUES ($1, $2, $3)
-                ON CONFLICT (supplier_id, ng_id) 
-                DO UPDATE SET instructions = $3
-                """,
-                parsed_supplier_id,
-                parsed_ng_id,
-                instructions_text,
+
+        accepted = list(accepted_by_key.values())
+        if not accepted:
+            return completion_status
+
+        completed_rows = [
+            (ng_id, sup_id) for ng_id, sup_id, _, is_completed in accepted if is_completed
+        ]
+        for _, parsed_supplier_id in completed_rows:
+            logger.info(
+                f"[Orchestrator {self.ng_id}] Marking conversation with supplier {parsed_supplier_id} as COMPLETED"
             )
 
-            # If conversation is completed, mark the latest message as completed
-            if is_completed:
-                logger.info(
-                    f"[Orchestrator {self.ng_id}] Marking conversation with supplier {parsed_supplier_id} as COMPLETED"
-                )
-                # Mark the most recent message in this conversation as completed
-                await self.db_pool.execute(
-                    """
-                    UPDATE message 
-                    SET completed = TRUE 
-                    WHERE ng_id = $1 AND supplier_id = $2 
-                    AND message_id = (
-                        SELECT message_id FROM message 
-                        WHERE ng_id = $1 AND supplier_id = $2 
-                        ORDER BY message_timestamp DESC 
-                        LIMIT 1
-                    )
-                    """,
-                    parsed_ng_id,
-                    parsed_supplier_id,
+        # Apply all writes on one connection: instructions and completion
+        # flags commit together, then activity rows reuse the same connection.
+        async with self.db_pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.executemany(
+                    UPSERT_INSTRUCTIONS_SQL,
+                    [(sup_id, ng_id, text) for ng_id, sup_id, text, _ in accepted],
                 )
+                if completed_rows:
+                    await conn.executemany(MARK_COMPLETED_SQL, completed_rows)
 
-                # Generate and persist a final summary for this supplier
+            for _, parsed_supplier_id, instructions_text, is_completed in accepted:
                 try:
-                    messages_for_summary = grouped.get(parsed_supplier_id, [])
-                    summary_text = await self._generate_completion_summary(
-                        parsed_supplier_id,
-                        messages_for_summary,
-                        instructions_text,
+                    await self._log_activity(
+                        parsed_supplier_id, instructions_text, is_completed, conn=conn
                     )
-                    await self._save_summary(parsed_supplier_id, summary_text)
-                except Exception as summary_error:  # pragma: no cover - best effort
+                except Exception as log_error:
                     logger.warning(
-                        f"[Orchestrator {self.ng_id}] Failed to save summary for supplier {parsed_supplier_id}: {summary_error}"
+                        f"[Orchestrator {self.ng_id}] Failed to log activity for supplier {parsed_supplier_id}: {log_error}"
                     )
 
-            # Log orchestrator activity for this supplier
-            try:
-                await self._log_activity(
-                    parsed_supplier_id, instructions_text, is_completed
-                )
-            except Exception as log_error:
-                logger.warning(
-                    f"[Orchestrator {self.ng_id}] Failed to log activity for supplier {parsed_supplier_id}: {log_error}"
-                )
+        # Final summaries are independent LLM calls, so overlap them
+        summary_jobs = [
+            self._summarize_completed(
+                parsed_supplier_id,
+                grouped.get(parsed_supplier_id, []),
+                instructions_text,
+            )
+            for _, parsed_supplier_id, instructions_text, is_completed in accepted
+            if is_completed
+        ]
+        if summary_jobs:
+            await asyncio.gather(*summary_jobs)
 
         return completion_status
@@ -1,9 +1,14 @@
 import asyncio
-import email
+import base64
 import os
+import quopri
+import re
+from contextlib import suppress
 from email.message import EmailMessage
+from email.parser import BytesHeaderParser
 from email.header import decode_header
-from typing import AsyncGenerator
+from functools import lru_cache
+from typing import Any, AsyncGenerator
 import logging
 
 import aiosmtplib
@@ -15,6 +20,172 @@ logging.basicConfig(
 )
 logger = logging.getLogger("email_client")
 
+# Re-issue IDLE periodically; servers and NAT gateways drop connections that
+# stay silent for too long (RFC 2177 allows at most 29 minutes).
+IDLE_REFRESH_SECONDS = 10 * 60
+
+# Only the headers we read and the body part we use are downloaded; attachments
+# and HTML alternatives stay on the server. PEEK leaves the \Seen flag alone.
+HEADER_FETCH = "(BODYSTRUCTURE BODY.PEEK[HEADER.FIELDS (SUBJECT FROM)])"
+
+# Parsed emails buffered between the folder watchers and the consumer
+EMAIL_QUEUE_SIZE = 64
+
+# Text parts bigger than this are decoded in a worker thread
+THREAD_DECODE_BYTES = 256 * 1024
+
+# Only header blocks are ever parsed; the compat32 policy keeps raw header
+# strings, which _decode_subject turns into text once per distinct subject.
+_HEADER_PARSER = BytesHeaderParser()
+
+_WS_RE = re.compile(r"\s+")
+
+_IMAP_TOKEN_RE = re.compile(
+    rb'\(|\)|"(?:[^"\\]|\\.)*"|\{\d+\}|[^\s()"{\[]+(?:\[[^\]]*\](?:<\d+>)?)?'
+)
+_IMAP_ESCAPE_RE = re.compile(rb"\\(.)")
+_FETCH_START_RE = re.compile(rb"\d+ FETCH \(")
+_UIDNEXT_RE = re.compile(rb"\[UIDNEXT (\d+)\]")
+_UIDVALIDITY_RE = re.compile(rb"\[UIDVALIDITY (\d+)\]")
+_STATUS_UIDNEXT_RE = re.compile(rb"\(.*UIDNEXT (\d+)")
+_NONEXISTENT_RE = re.compile(rb"\[NONEXISTENT\]")
+# Structural parens are tagged with these markers so a quoted "(" or ")"
+# (e.g. in a filename) stays a plain string
+_LIST_OPEN = object()
+_LIST_CLOSE = object()
+
+
+def _select_code(lines: list, pattern: re.Pattern) -> int | None:
+    """Read a numeric response code such as [UIDNEXT n] from SELECT output."""
+    for line in lines:
+        match = pattern.search(line)
+        if match:
+            return int(match.group(1))
+    return None
+
+
+def _parse_fetch_response(lines: list) -> dict[str, Any]:
+    """
+    Parse the data of a single FETCH response into {item name: value}.
+    Parenthesized lists become Python lists, NIL becomes None and strings
+    (quoted or literal) become bytes.
+    """
+    tokens: list = []
+    for line in lines:
+        if isinstance(line, bytearray):
+            # aioimaplib hands literal payloads over as separate bytearrays
+            tokens.append(bytes(line))
+            continue
+        for match in _IMAP_TOKEN_RE.finditer(line):
+            token = match.group()
+            if token == b"(":
+                token = _LIST_OPEN
+            elif token == b")":
+                token = _LIST_CLOSE
+            elif token.startswith(b"{"):
+                continue  # literal size marker; the payload is the next line
+            elif token.startswith(b'"'):
+                token = _IMAP_ESCAPE_RE.sub(rb"\1", token[1:-1])
+            elif token.upper() == b"NIL":
+                token = None
+            tokens.append(token)
+
+    def parse_list(pos: int) -> tuple[list, int]:
+        items: list = []
+        while pos < len(tokens):
+            token = tokens[pos]
+            if token is _LIST_OPEN:
+                item, pos = parse_list(pos + 1)
+                items.append(item)
+            elif token is _LIST_CLOSE:
+                return items, pos + 1
+            else:
+                items.append(token)
+                pos += 1
+        return items, pos
+
+    start = tokens.index(_LIST_OPEN)
+    items, _ = parse_list(start + 1)
+    return {
+        items[i].decode().upper(): items[i + 1] for i in range(0, len(items) - 1, 2)
+    }
+
+
+@lru_cache(maxsize=1024)
+def _decode_subject(raw: str) -> str:
+    """Decode an RFC 2047 subject; reply threads repeat the same raw header."""
+    subject_parts = []
+    for content, encoding in decode_header(raw):
+        if isinstance(content, bytes):
+            subject_parts.append(content.decode(encoding or "utf-8"))
+        else:
+            subject_parts.append(str(content))
+    return "".join(subject_parts)
+
+
+def _split_fetch_responses(lines: list) -> list[list]:
+    """Split the lines of a multi-message FETCH into one list per message."""
+    responses: list[list] = []
+    for line in lines:
+        if not isinstance(line, bytearray) and _FETCH_START_RE.match(line):
+            responses.append([line])
+        elif responses:
+            responses[-1].append(line)
+    return responses
+
+
+def _compress_uids(uids: list[int]) -> str:
+    """Build a compact IMAP message set, e.g. [1, 2, 3, 7] -> "1:3,7"."""
+    ranges = []
+    for uid in sorted(uids):
+        if ranges and uid == ranges[-1][1] + 1:
+            ranges[-1][1] = uid
+        else:
+            ranges.append([uid, uid])
+    return ",".join(f"{lo}:{hi}" if lo != hi else str(lo) for lo, hi in ranges)
+
+
+def _find_text_part(structure: list, section: str = "") -> tuple[str, str, str] | None:
+    """
+    Locate the first text/plain part in a BODYSTRUCTURE, depth first.
+    Returns (section, transfer encoding, charset). A single-part message
+    is returned as section "1" whatever its type, like the full parse did.
+    """
+    if structure and isinstance(structure[0], list):
+        for index, part in enumerate(structure):
+            if not isinstance(part, list):
+                break  # multipart subtype follows the parts
+            part_section = f"{section}.{index + 1}" if section else str(index + 1)
+            found = _find_text_part(part, part_section)
+            if found:
+                return found
+        return None
+
+    maintype = (structure[0] or b"").decode().lower()
+    subtype = (structure[1] or b"").decode().lower()
+    if section and (maintype, subtype) != ("text", "plain"):
+        return None
+
+    params = structure[2] or []
+    charset = "utf-8"
+    for i in range(0, len(params) - 1, 2):
+        if params[i].decode().lower() == "charset" and params[i + 1]:
+            charset = params[i + 1].decode()
+    encoding = (structure[5] or b"7bit").decode().lower()
+    return section or "1", encoding, charset
+
+
+def _decode_part(payload: bytes, encoding: str, charset: str) -> str:
+    if encoding == "base64":
+        payload = base64.b64decode(payload)
+    elif encoding == "quoted-printable":
+        payload = quopri.decodestring(payload)
+    try:
+        return payload.decode(charset, errors="replace")
+    except LookupError:
+        # Unknown charset name; errors="replace" only covers bad bytes
+        return payload.decode("utf-8", errors="replace")
+
 
 class EmailClient:
     def __init__(self):
@@ -25,43 +196,55 @@ class EmailClient:
         self.smtp_port = int(os.getenv("SMTP_PORT", "465"))
         self.imap_server = os.getenv("IMAP_SERVER", "imap.mail.eu-west-1.awsapps.com")
         self.imap_port = int(os.getenv("IMAP_PORT", "993"))
+        self.watch_folders = ["INBOX", "Junk E-mail"]
+        # One long-lived SMTP session shared by all sends; the lock serializes
+        # use of the connection and its (re)creation.
+        self._smtp: aiosmtplib.SMTP | None = None
+        self._smtp_lock = asyncio.Lock()
 
     async def email_login(self, email_addr: str, password: str) -> bool:
         """
         1. Logs into a user email.
         Verifies credentials via SMTP and stores them for session use.
+        The verified SMTP session is kept open for the following sends.
         """
+        smtp = None
         try:
-            use_tls = self.smtp_port == 465
-
-            smtp = aiosmtplib.SMTP(
-                hostname=self.smtp_server,
-                port=self.smtp_port,
-                use_tls=use_tls,
-                timeout=15,
+            # The SMTP session and the IMAP check are independent handshakes
+            smtp, imap_result = await asyncio.gather(
+                self._connect_smtp(email_addr, password, timeout=15),
+                self._verify_imap(email_addr, password),
+                return_exceptions=True,
             )
-            await smtp.connect()
-            if not use_tls:
-                await smtp.starttls()
-            await smtp.login(email_addr, password)
-            await smtp.quit()
-
-            # Verify receiving capability (IMAP)
-            imap = aioimaplib.IMAP4_SSL(
-                host=self.imap_server, port=self.imap_port, timeout=15
-            )
-            await imap.wait_hello_from_server()
-            await imap.login(email_addr, password)
-            await imap.logout()
+            if isinstance(smtp, BaseException):
+                failed, smtp = smtp, None
+                raise failed
+            if isinstance(imap_result, BaseException):
+                raise imap_result
 
             self.email_address = email_addr
             self.password = password
+            # Replace any session that belongs to the previous credentials
+            async with self._smtp_lock:
+                await self._drop_smtp()
+                self._smtp = smtp
             logger.info(f"Successfully logged in as {email_addr}")
             return True
         except Exception as e:
+            if smtp is not None:
+                smtp.close()
             logger.error(f"Login failed: {e}")
             raise ValueError(f"Authentication failed: {e}")
 
+    async def _verify_imap(self, email_addr: str, password: str) -> None:
+        """Verify receiving capability (IMAP) with a login/logout round trip."""
+        imap = aioimaplib.IMAP4_SSL(
+            host=self.imap_server, port=self.imap_port, timeout=15
+        )
+        await imap.wait_hello_from_server()
+        await imap.login(email_addr, password)
+        await imap.logout()
+
     async def email_send(self, to_email: str, subject: str, body: str) -> None:
         """
         3. Sends the email to a given address using logged-in credentials.
@@ -69,9 +252,8 @@ class EmailClient:
         if not self.email_address or not self.password:
             raise RuntimeError("User not logged in. Call email_login first.")
 
-        # Sanitize subject - remove newlines and carriage returns
-        clean_subject = subject.replace("\n", " ").replace("\r", " ").strip()
-        clean_subject = " ".join(clean_subject.split())  # collapse multiple spaces
+        # Sanitize subject - fold newlines and runs of whitespace into single spaces
+        clean_subject = _WS_RE.sub(" ", subject).strip()
 
         message = EmailMessage()
         message["From"] = self.email_address
@@ -79,202 +261,354 @@ class EmailClient:
         message["Subject"] = clean_subject
         message.set_content(body)
 
+        async with self._smtp_lock:
+            smtp = await self._get_smtp()
+            try:
+                await smtp.send_message(message)
+            except (aiosmtplib.SMTPServerDisconnected, ConnectionError) as e:
+                # The server closed the idle session; reconnect once and retry
+                logger.info(f"SMTP session dropped ({e}), reconnecting...")
+                await self._drop_smtp()
+                smtp = await self._get_smtp()
+                await smtp.send_message(message)
+
+    async def close(self) -> None:
+        """Close the shared SMTP session (call on shutdown)."""
+        async with self._smtp_lock:
+            await self._drop_smtp()
+
+    async def _get_smtp(self) -> aiosmtplib.SMTP:
+        """Return the shared SMTP session, connecting and logging in if needed."""
+        if self._smtp is None or not self._smtp.is_connected:
+            self._smtp = await self._connect_smtp(self.email_address, self.password)
+        return self._smtp
+
+    async def _connect_smtp(
+        self, email_addr: str, password: str, timeout: float = 20
+    ) -> aiosmtplib.SMTP:
         use_tls = self.smtp_port == 465
-
-        await aiosmtplib.send(
-            message,
+        smtp = aiosmtplib.SMTP(
             hostname=self.smtp_server,
             port=self.smtp_port,
-            username=self.email_address,
-            password=self.password,
             use_tls=use_tls,
             start_tls=not use_tls,
-            timeout=20,
+            timeout=timeout,
         )
+        await smtp.connect()
+        await smtp.login(email_addr, password)
+        return smtp
+
+    async def _drop_smtp(self) -> None:
+        """Close the shared SMTP session, ignoring errors from a dead socket."""
+        smtp, self._smtp = self._smtp, None
+        if smtp is None:
+            return
+        try:
+            await smtp.quit()
+        except Exception:
+            smtp.close()
 
     async def email_trigger(self, poll_interval: int = 2) -> AsyncGenerator[dict, None]:
         """
         2. Monitors INBOX and Junk for NEW messages.
-        It takes a snapshot of existing emails on start, and only yields
-        when a new Message ID appears (count increases).
+        Each folder is watched on its own IMAP connection (IMAP IDLE when the
+        server supports it, polling otherwise). Watchers take a snapshot of
+        existing emails on start and only report messages that appear later.
         """
         if not self.email_address or not self.password:
             raise RuntimeError("User not logged in.")
 
-        folders_to_check = ["INBOX", "Junk E-mail"]
-
-        # Dictionary to store the set of known IDs per folder
-        # Structure: {'INBOX': {b'1', b'2'}, 'Junk E-mail': {b'5'}}
-        known_ids = {folder: set() for folder in folders_to_check}
-        is_first_run = True
-
         logger.info(
             "Starting Email Trigger... taking initial snapshot (ignoring old emails)..."
         )
 
+        # Watchers keep fetching while the consumer processes earlier emails;
+        # the bound applies back-pressure if the consumer falls far behind.
+        queue: asyncio.Queue[dict | None] = asyncio.Queue(maxsize=EMAIL_QUEUE_SIZE)
+        watchers = [
+            asyncio.create_task(self._watch_folder(folder, queue, poll_interval))
+            for folder in self.watch_folders
+        ]
+
+        def watcher_done(_: asyncio.Task) -> None:
+            # Wake a consumer blocked on an empty queue once nothing can
+            # feed it any more; a full queue means it is not blocked
+            if all(watcher.done() for watcher in watchers):
+                with suppress(asyncio.QueueFull):
+                    queue.put_nowait(None)
+
+        for watcher in watchers:
+            watcher.add_done_callback(watcher_done)
+        try:
+            while True:
+                if queue.empty() and all(watcher.done() for watcher in watchers):
+                    raise RuntimeError("All email folder watchers have stopped")
+                email_data = await queue.get()
+                if email_data is not None:
+                    yield email_data
+        finally:
+            for watcher in watchers:
+                watcher.cancel()
+            await asyncio.gather(*watchers, return_exceptions=True)
+
+    async def _watch_folder(
+        self, folder: str, queue: asyncio.Queue, poll_interval: int
+    ) -> None:
+        """Feed new emails from one folder into the queue, reconnecting on errors."""
+        # Highest UID already seen; UIDs only grow, so this replaces a set of IDs.
+        # UIDs are only comparable while the folder's UIDVALIDITY is unchanged.
+        last_uid: int | None = None
+        uid_validity: int | None = None
+
         while True:
+            imap = None
             try:
                 # 1. Connect
                 logger.info(
-                    f"Connecting to IMAP server {self.imap_server}:{self.imap_port}..."
+                    f"[{folder}] Connecting to IMAP server {self.imap_server}:{self.imap_port}..."
                 )
                 imap = aioimaplib.IMAP4_SSL(
                     host=self.imap_server, port=self.imap_port, timeout=30
                 )
                 await imap.wait_hello_from_server()
-                logger.info("IMAP server hello received")
+                logger.info(f"[{folder}] IMAP server hello received")
                 await imap.login(self.email_address, self.password)
-                logger.info("IMAP login successful")
+                logger.info(f"[{folder}] IMAP login successful")
+
+                res, select_lines = await imap.select(folder)
+                if res != "OK":
+                    # Only a folder that does not exist is given up on; any
+                    # other refusal (throttling, busy server) is retried
+                    if any(_NONEXISTENT_RE.search(line) for line in select_lines):
+                        logger.warning(
+                            f"[{folder}] Folder not available ({res}), not watching it"
+                        )
+                        await imap.logout()
+                        return
+                    logger.warning(f"[{folder}] SELECT failed: {res} {select_lines}")
+                    raise RuntimeError(f"SELECT {folder} returned {res}")
+
+                validity = _select_code(select_lines, _UIDVALIDITY_RE)
+                if validity != uid_validity:
+                    if last_uid is not None:
+                        logger.warning(
+                            f"[{folder}] UIDVALIDITY changed, taking a new snapshot"
+                        )
+                    uid_validity = validity
+                    last_uid = None
+                if last_uid is None:
+                    # Everything below UIDNEXT already exists, so the snapshot
+                    # needs no SEARCH at all when the server reports it
+                    uid_next = _select_code(select_lines, _UIDNEXT_RE)
+                    if uid_next is not None:
+                        last_uid = uid_next - 1
+                        logger.info(
+                            f"[{folder}] Initial snapshot: UIDs below {uid_next} are existing emails"
+                        )
+
+                use_idle = imap.has_capability("IDLE")
+                logger.info(
+                    f"[{folder}] Waiting for new mail via {'IDLE' if use_idle else 'polling'}"
+                )
 
                 # 2. Loop
-                folders_warned = set()
                 while True:
-                    for folder in folders_to_check:
-                        res, _ = await imap.select(folder)
-                        if res != "OK":
-                            # Only warn once per folder to avoid spam
-                            if folder not in folders_warned:
-                                logger.debug(f"Folder {folder} not available: {res}")
-                                folders_warned.add(folder)
-                            continue
-
-                        # Search ALL emails (Read or Unread) to get the IDs
-                        res, data = await imap.search("ALL")
-
-                        current_ids = set()
-                        if res == "OK" and data[0]:
-                            current_ids = set(data[0].split())
-
-                        # Identify NEW IDs
-                        new_ids = current_ids - known_ids[folder]
+                    if last_uid is None:
+                        # First run without UIDNEXT: remember where the mailbox
+                        # ends so we don't trigger on old history.
+                        res, data = await imap.uid_search("ALL")
+                        uids = [int(uid) for uid in data[0].split()] if res == "OK" else []
+                        last_uid = max(uids, default=0)
+                        logger.info(
+                            f"[{folder}] Initial snapshot: {len(uids)} existing emails"
+                        )
+                    elif use_idle or await self._uid_next_moved(imap, folder, last_uid):
+                        # "n:*" always matches the newest message, so filter
+                        res, data = await imap.uid_search(f"UID {last_uid + 1}:*")
+                        new_uids = []
+                        if res == "OK":
+                            new_uids = [
+                                uid
+                                for uid in map(int, data[0].split())
+                                if uid > last_uid
+                            ]
 
                         logger.debug(
-                            f"[{folder}] Current IDs: {len(current_ids)}, Known IDs: {len(known_ids[folder])}, New IDs: {len(new_ids)}"
+                            "[%s] Last UID: %s, New UIDs: %d",
+                            folder,
+                            last_uid,
+                            len(new_uids),
                         )
 
-                        # If this is the first run, we just mark everything as "known"
-                        # so we don't trigger on old history.
-                        if is_first_run:
-                            known_ids[folder] = current_ids
+                        if new_uids:
                             logger.info(
-                                f"[{folder}] Initial snapshot: {len(current_ids)} existing emails"
+                                f"[{folder}] Detected {len(new_uids)} new message(s)!"
                             )
-                            continue
-
-                        # If we found actual new emails
-                        if new_ids:
-                            logger.info(
-                                f"[{folder}] Detected {len(new_ids)} new message(s)!"
-                            )
-
-                            for msg_id in new_ids:
-                                # Convert bytes to string if needed
-                                msg_id_str = (
-                                    msg_id.decode()
-                                    if isinstance(msg_id, bytes)
-                                    else str(msg_id)
-                                )
-                                logger.info(
-                                    f"[{folder}] Fetching message ID: {msg_id_str}"
-                                )
-                                # Fetch content
-                                res, msg_data = await imap.fetch(msg_id_str, "(RFC822)")
-                                logger.info(
-                                    f"[{folder}] Fetch result: {res}, data length: {len(msg_data) if msg_data else 0}"
-                                )
-                                if res != "OK":
-                                    logger.warning(
-                                        f"[{folder}] Failed to fetch message {msg_id}: {res}"
-                                    )
-                                    continue
-
-                                try:
-                                    raw_email = msg_data[1]
-                                    logger.info(
-                                        f"[{folder}] Raw email size: {len(raw_email) if raw_email else 0} bytes"
-                                    )
-                                    msg = email.message_from_bytes(raw_email)
-                                except Exception as e:
-                                    logger.error(
-                                        f"[{folder}] Error parsing email {msg_id}: {e}"
-                                    )
-                                    continue
-
-                                # Parse Subject
-                                subject_header = msg["Subject"]
-                                if subject_header:
-                                    decoded_list = decode_header(subject_header)
-                                    subject_parts = []
-                                    for content, encoding in decoded_list:
-                                        if isinstance(content, bytes):
-                                            subject_parts.append(
-                                                content.decode(encoding or "utf-8")
-                                            )
-                                        else:
-                                            subject_parts.append(str(content))
-                                    subject = "".join(subject_parts)
-                                else:
-                                    subject = "(No Subject)"
-
-                                # Parse Sender
-                                sender = msg.get("From")
-                                logger.info(f"[{folder}] Parsed sender: {sender}")
-
-                                # Parse Body
-                                body = ""
-                                try:
-                                    if msg.is_multipart():
-                                        logger.info(f"[{folder}] Email is multipart")
-                                        for part in msg.walk():
-                                            if part.get_content_type() == "text/plain":
-                                                payload = part.get_payload(decode=True)
-                                                if payload:
-                                                    body = payload.decode()
-                                                    break  # Prefer plain text
-                                    else:
-                                        logger.info(f"[{folder}] Email is single part")
-                                        payload = msg.get_payload(decode=True)
-                                        if payload:
-                                            body = payload.decode()
-                                except Exception as e:
-                                    logger.error(f"[{folder}] Error parsing body: {e}")
-                                    body = "(Error parsing body)"
-
-                                logger.info(
-                                    f"[{folder}] New email - From: {sender}, Subject: {subject}"
-                                )
-                                logger.info(
-                                    f"[{folder}] Email body length: {len(body)} chars"
-                                )
-
-                                logger.info(f"[{folder}] Yielding email to watcher...")
-                                yield {
-                                    "folder": folder,
-                                    "sender": sender,
-                                    "subject": subject,
-                                    "body": body,
-                                }
-                                logger.info(f"[{folder}] Email yielded successfully")
-
+                            for email_data in await self._fetch_emails(
+                                imap, folder, new_uids
+                            ):
+                                await queue.put(email_data)
                             # Update state so we don't fetch these again
-                            known_ids[folder].update(new_ids)
-
-                    # Mark initialization as done after the first successful folder scan
-                    if is_first_run:
-                        logger.info("Snapshot complete. Listening for NEW emails...")
-                        is_first_run = False
-
-                    await asyncio.sleep(poll_interval)
-
-            except (asyncio.CancelledError, KeyboardInterrupt):
-                logger.info("Email trigger cancelled")
-                try:
-                    await imap.logout()
-                except:
-                    pass
+                            last_uid = max(new_uids)
+
+                    if use_idle:
+                        await self._wait_for_new_mail(imap)
+                    else:
+                        await asyncio.sleep(poll_interval)
+
+            except asyncio.CancelledError:
+                logger.info(f"[{folder}] Email watcher cancelled")
+                if imap is not None:
+                    with suppress(Exception):
+                        await imap.logout()
                 raise
             except Exception as e:
                 logger.error(
-                    f"Connection lost ({e}). Reconnecting in 5s... (known IDs are preserved)"
+                    f"[{folder}] Connection lost ({e}). Reconnecting in 5s... (last seen UID is preserved)"
                 )
                 await asyncio.sleep(5)
+
+    async def _uid_next_moved(
+        self, imap: aioimaplib.IMAP4_SSL, folder: str, last_uid: int
+    ) -> bool:
+        """
+        Cheap poll-mode check: STATUS (UIDNEXT) tells whether anything was
+        appended since last_uid without running a SEARCH. Falls back to
+        searching when the server doesn't answer usefully.
+        """
+        res, lines = await imap.status(folder, "(UIDNEXT)")
+        uid_next = _select_code(lines, _STATUS_UIDNEXT_RE) if res == "OK" else None
+        return uid_next is None or uid_next > last_uid + 1
+
+    async def _wait_for_new_mail(self, imap: aioimaplib.IMAP4_SSL) -> None:
+        """
+        Park the connection in IDLE until the server reports new mail (EXISTS)
+        or the IDLE period runs out, then leave IDLE so commands can be sent.
+        """
+        idle = await imap.idle_start(timeout=IDLE_REFRESH_SECONDS)
+        try:
+            while True:
+                push = await imap.wait_server_push()
+                if push == aioimaplib.STOP_WAIT_SERVER_PUSH:
+                    return
+                if any(b"EXISTS" in line for line in push):
+                    return
+        finally:
+            imap.idle_done()
+            await asyncio.wait_for(idle, timeout=10)
+
+    async def _fetch_emails(
+        self, imap: aioimaplib.IMAP4_SSL, folder: str, uids: list[int]
+    ) -> list[dict]:
+        """
+        Fetch new messages by UID and parse sender, subject and plain-text body.
+        Structure and headers for all messages come back in one FETCH, then
+        the text parts in one FETCH per distinct section number.
+        """
+        uid_set = _compress_uids(uids)
+        logger.debug("[%s] Fetching message UIDs: %s", folder, uid_set)
+        res, msg_data = await imap.uid("fetch", uid_set, HEADER_FETCH)
+        logger.debug(
+            "[%s] Fetch result: %s, data length: %d",
+            folder,
+            res,
+            len(msg_data) if msg_data else 0,
+        )
+        if res != "OK":
+            logger.warning(f"[{folder}] Failed to fetch messages {uid_set}: {res}")
+            return []
+
+        messages: dict[int, tuple[Any, tuple[str, str, str] | None]] = {}
+        for response in _split_fetch_responses(msg_data):
+            try:
+                items = _parse_fetch_response(response)
+                if "UID" not in items:
+                    continue  # unsolicited FETCH (e.g. flag update)
+                uid = int(items["UID"])
+                header_bytes = next(
+                    value for key, value in items.items() if key.startswith("BODY[HEADER")
+                )
+                msg = _HEADER_PARSER.parsebytes(header_bytes or b"")
+                messages[uid] = (msg, _find_text_part(items["BODYSTRUCTURE"]))
+            except Exception as e:
+                logger.error(f"[{folder}] Error parsing email: {e}")
+
+        # Group messages by the section holding their text/plain part
+        by_section: dict[str, list[int]] = {}
+        for uid, (_, text_part) in messages.items():
+            if text_part is not None:
+                by_section.setdefault(text_part[0], []).append(uid)
+
+        bodies: dict[int, str] = {}
+        for section, section_uids in by_section.items():
+            try:
+                res, part_data = await imap.uid(
+                    "fetch", _compress_uids(section_uids), f"(BODY.PEEK[{section}])"
+                )
+                if res != "OK":
+                    raise RuntimeError(f"fetch returned {res}")
+            except Exception as e:
+                logger.error(f"[{folder}] Error fetching body part {section}: {e}")
+                for uid in section_uids:
+                    bodies[uid] = "(Error parsing body)"
+                continue
+
+            # A bad part only costs its own message, not the rest of the group
+            failed = False
+            for response in _split_fetch_responses(part_data):
+                try:
+                    items = _parse_fetch_response(response)
+                    if "UID" not in items or int(items["UID"]) not in messages:
+                        continue  # unsolicited FETCH (e.g. flag update)
+                    uid = int(items["UID"])
+                    payload = items.get(f"BODY[{section}]")
+                    _, encoding, charset = messages[uid][1]
+                    if not payload:
+                        bodies[uid] = ""
+                    elif len(payload) > THREAD_DECODE_BYTES:
+                        # Large parts would stall the event loop while decoding
+                        bodies[uid] = await asyncio.to_thread(
+                            _decode_part, payload, encoding, charset
+                        )
+                    else:
+                        bodies[uid] = _decode_part(payload, encoding, charset)
+                except Exception as e:
+                    failed = True
+                    logger.error(f"[{folder}] Error parsing body: {e}")
+            if failed:
+                for uid in section_uids:
+                    bodies.setdefault(uid, "(Error parsing body)")
+            logger.debug(
+                "[%s] Fetched body part %s for %d message(s)",
+                folder,
+                section,
+                len(section_uids),
+            )
+
+        emails = []
+        for uid in sorted(messages):
+            msg = messages[uid][0]
+
+            # Parse Subject
+            subject_header = msg["Subject"]
+            subject = (
+                _decode_subject(str(subject_header)) if subject_header else "(No Subject)"
+            )
+
+            # Parse Sender
+            sender = msg.get("From")
+            body = bodies.get(uid, "")
+
+            logger.info(
+                f"[{folder}] New email - From: {sender}, Subject: {subject} ({len(body)} chars)"
+            )
+
+            emails.append(
+                {
+                    "folder": folder,
+                    "sender": sender,
+                    "subject": subject,
+                    "body": body,
+                }
+            )
+        return emails
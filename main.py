@@ -1,6 +1,7 @@
 import asyncio
-import json
+import hashlib
 import os
+import re
 import uuid
 import logging
 from contextlib import asynccontextmanager
@@ -9,14 +10,21 @@ from datetime import datetime
 
 from dotenv import load_dotenv
 from pydantic import BaseModel
-from fastapi import HTTPException, FastAPI
+from fastapi import BackgroundTasks, HTTPException, FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
 import asyncpg
 import boto3
+from botocore.config import Config
 
 # Local imports
 from email_client import EmailClient
-from agents import NegotiationAgent, OrchestratorAgent, strip_reasoning_tokens
+from agents import (
+    NegotiationAgent,
+    OrchestratorAgent,
+    invoke_model,
+    strip_reasoning_tokens,
+)
 from router import EmailEventRouter, NegotiationSession
 
 load_dotenv()
@@ -30,6 +38,14 @@ logger = logging.getLogger("negotiation")
 DATABASE_URL = os.environ["DB_URL"]
 AWS_REGION = os.environ.get("AWS_REGION", "eu-west-1")
 FRONTEND_ORIGINS = os.environ.get("FRONTEND_ORIGINS", "")
+# Prepared statements break behind transaction-mode poolers (PgBouncer), so
+# the cache stays off unless the database is reached directly
+DB_STATEMENT_CACHE_SIZE = int(os.environ.get("DB_STATEMENT_CACHE_SIZE", "0"))
+# Concurrent email handlers and status polls each hold a connection briefly;
+# keep max_size within the server's max_connections
+DB_POOL_MIN = int(os.environ.get("DB_POOL_MIN", "10"))
+DB_POOL_MAX = int(os.environ.get("DB_POOL_MAX", "20"))
+DB_COMMAND_TIMEOUT = float(os.environ.get("DB_COMMAND_TIMEOUT", "30"))
 
 NEGOTIATOR_AGENT_SYSTEM_PROMPT = """
 You are a skilled negotation agent representing a buyer in a procurment process. Your goal is to win the best possible deal for the
@@ -51,13 +67,30 @@ competing offer from another supplier that your agents are alo negotiating with.
 If you see during your anaylsis that one of the suppliers has made a final offer. Mark the negotiation as complete;
 """
 
-bedrock_client = boto3.client("bedrock-runtime", region_name=AWS_REGION)
+# Calls run in worker threads (agents.invoke_model), so the urllib3 pool must
+# be large enough for concurrent negotiations to reuse warm TLS connections
+bedrock_client = boto3.client(
+    "bedrock-runtime",
+    region_name=AWS_REGION,
+    config=Config(
+        max_pool_connections=64,
+        retries={"max_attempts": 3, "mode": "adaptive"},
+        tcp_keepalive=True,
+    ),
+)
 
 pool: asyncpg.Pool | None = None
 # --- Initialize Email Client ---
 email_client = EmailClient()
 email_router = EmailEventRouter()
 active_sessions: dict[str, NegotiationSession] = {}
+# First 8 hex chars of ng_id -> ng_id, for resolving [REF-...] subject tags
+active_sessions_by_prefix: dict[str, str] = {}
+
+# "Name <email@domain.com>" sender format
+_ANGLE_EMAIL_RE = re.compile(r"<([^>]+)>")
+# [REF-xxxxxxxx-yyyy-yyyy-yyyy] subject tag: ng_id prefix + supplier UUID middle
+_REF_RE = re.compile(r"\[REF-([a-f0-9]{8})-([a-f0-9-]{14})\]", re.IGNORECASE)
 
 EMAIL_ADDRESS = os.environ.get("EMAIL_USER")
 EMAIL_PASSWORD = os.environ.get("EMAIL_PASSWORD")
@@ -202,14 +235,8 @@ Context:
     }
 
     try:
-        response = bedrock_client.invoke_model(
-            modelId="openai.gpt-oss-120b-1:0",
-            contentType="application/json",
-            accept="application/json",
-            body=json.dumps(body),
-        )
-        result = json.loads(response["body"].read())
-        overview_text = result["choices"][0]["message"]["content"]
+        # The status page is polled, so unchanged progress reuses the last overview
+        overview_text = await invoke_model(bedrock_client, body, cache=True)
         overview_text = strip_reasoning_tokens(overview_text)
         return overview_text.strip()
     except Exception as exc:  # pragma: no cover - best effort
@@ -221,11 +248,9 @@ Context:
 
 async def email_watcher():
     """Background task that watches for incoming emails and routes them."""
-    import re
-
     logger.info("Starting email watcher task...")
-    logger.info(f"Email client logged in: {email_client.email_address is not None}")
-    logger.info(f"Active sessions count: {len(active_sessions)}")
+    logger.info("Email client logged in: %s", email_client.email_address is not None)
+    logger.info("Active sessions count: %d", len(active_sessions))
 
     try:
         logger.info("Starting email_trigger generator...")
@@ -233,86 +258,94 @@ async def email_watcher():
             logger.info("=" * 50)
             logger.info("EMAIL WATCHER: Received email from email_trigger")
             logger.info(
-                f"New email received from: {email_data['sender']}, subject: {email_data['subject']}"
+                "New email received from: %s, subject: %s",
+                email_data["sender"],
+                email_data["subject"],
             )
 
             # Try to find matching supplier by email
-            db = await get_pool()
+            db = get_pool()
             sender_email = email_data["sender"]
 
             # Extract email from "Name <email@domain.com>" format if needed
-            email_match = re.search(r"<([^>]+)>", sender_email)
+            email_match = _ANGLE_EMAIL_RE.search(sender_email)
             if email_match:
                 sender_email = email_match.group(1)
 
-            supplier_row = await db.fetchrow(
-                "SELECT supplier_id FROM supplier WHERE supplier_email = $1",
-                sender_email,
-            )
-
-            if not supplier_row:
-                logger.warning(f"No supplier found for email: {email_data['sender']}")
-                continue
-
-            # Try to extract ng_id and sup_id from subject line [REF-xxxxxxxx-yyyyyyyy]
-            ng_id = None
-            supplier_id = None
-            subject = email_data["subject"]
-            ref_match = re.search(
-                r"\[REF-([a-f0-9]{8})-([a-f0-9-]{14})\]", subject, re.IGNORECASE
-            )
-
-            if ref_match:
-                ng_prefix = ref_match.group(1)
-                sup_middle = ref_match.group(2)  # e.g., "0013-4000-8000" from UUID
-                logger.info(
-                    f"Found reference in subject: ng={ng_prefix}, sup_middle={sup_middle}"
+            # One connection serves every lookup for this email
+            async with db.acquire() as conn:
+                supplier_row = await conn.fetchrow(
+                    "SELECT supplier_id FROM supplier WHERE supplier_email = $1",
+                    sender_email,
                 )
 
-                # Find the full ng_id that starts with this prefix
-                for session_ng_id in active_sessions.keys():
-                    if session_ng_id.startswith(ng_prefix):
-                        ng_id = session_ng_id
-                        break
-
-                # Also check DB if not in active sessions
-                if not ng_id:
-                    ng_row = await db.fetchrow(
-                        "SELECT ng_id FROM negotiation WHERE CAST(ng_id AS TEXT) LIKE $1",
-                        f"{ng_prefix}%",
+                if not supplier_row:
+                    logger.warning(
+                        "No supplier found for email: %s", email_data["sender"]
                     )
-                    if ng_row:
-                        ng_id = str(ng_row["ng_id"])
-
-                # Find the full supplier_id using the middle part of UUID
-                # sup_middle is like "0013-4000-8000" - we search for UUIDs containing this
-                # First try to match within the negotiation's agents (more specific)
-                if ng_id:
-                    sup_row = await db.fetchrow(
-                        "SELECT sup_id FROM agent WHERE ng_id = $1 AND CAST(sup_id AS TEXT) LIKE $2",
-                        ng_id,
-                        f"%-{sup_middle}%",
+                    continue
+
+                # Try to extract ng_id and sup_id from subject line [REF-xxxxxxxx-yyyyyyyy]
+                ng_id = None
+                supplier_id = None
+                subject = email_data["subject"]
+                ref_match = _REF_RE.search(subject)
+
+                if ref_match:
+                    ng_prefix = ref_match.group(1).lower()
+                    sup_middle = ref_match.group(2).lower()  # e.g., "0013-4000-8000" from UUID
+                    logger.info(
+                        "Found reference in subject: ng=%s, sup_middle=%s",
+                        ng_prefix,
+                        sup_middle,
                     )
-                    if sup_row:
-                        supplier_id = str(sup_row["sup_id"])
-                        logger.info(
-                            f"Matched supplier from negotiation agents: {supplier_id}"
-                        )
 
-                # Fallback to global supplier lookup
-                if not supplier_id:
-                    sup_row = await db.fetchrow(
-                        "SELECT supplier_id FROM supplier WHERE CAST(supplier_id AS TEXT) LIKE $1",
-                        f"%-{sup_middle}%",
-                    )
-                    if sup_row:
-                        supplier_id = str(sup_row["supplier_id"])
-                        logger.info(f"Matched supplier from subject: {supplier_id}")
+                    # Find the full ng_id that starts with this prefix
+                    ng_id = active_sessions_by_prefix.get(ng_prefix)
+
+                    # Also check DB if not in active sessions. A UUID range on the
+                    # primary key matches the prefix without casting every row.
+                    if not ng_id:
+                        ng_row = await conn.fetchrow(
+                            "SELECT ng_id FROM negotiation WHERE ng_id BETWEEN $1::uuid AND $2::uuid LIMIT 1",
+                            f"{ng_prefix}-0000-0000-0000-000000000000",
+                            f"{ng_prefix}-ffff-ffff-ffff-ffffffffffff",
+                        )
+                        if ng_row:
+                            ng_id = str(ng_row["ng_id"])
+
+                    # Find the full supplier_id using the middle part of UUID
+                    # sup_middle is like "0013-4000-8000" - we search for UUIDs containing this
+                    # First try to match within the negotiation's agents (more specific)
+                    if ng_id:
+                        sup_row = await conn.fetchrow(
+                            "SELECT sup_id FROM agent WHERE ng_id = $1 AND substr(sup_id::text, 10, 14) = $2",
+                            ng_id,
+                            sup_middle,
+                        )
+                        if sup_row:
+                            supplier_id = str(sup_row["sup_id"])
+                            logger.info(
+                                "Matched supplier from negotiation agents: %s",
+                                supplier_id,
+                            )
+
+                    # Fallback to global supplier lookup
+                    if not supplier_id:
+                        sup_row = await conn.fetchrow(
+                            "SELECT supplier_id FROM supplier WHERE substr(supplier_id::text, 10, 14) = $1",
+                            sup_middle,
+                        )
+                        if sup_row:
+                            supplier_id = str(sup_row["supplier_id"])
+                            logger.info(
+                                "Matched supplier from subject: %s", supplier_id
+                            )
 
             # Fallback: try to match by sender email if no REF tag
             if not supplier_id and supplier_row:
                 supplier_id = str(supplier_row["supplier_id"])
-                logger.info(f"Matched supplier by email: {supplier_id}")
+                logger.info("Matched supplier by email: %s", supplier_id)
 
             # Fallback: find any active negotiation for this supplier
             if not ng_id and supplier_id:
@@ -324,12 +357,12 @@ async def email_watcher():
 
             if not ng_id:
                 logger.warning(
-                    f"No active negotiation found for supplier: {supplier_id}"
+                    "No active negotiation found for supplier: %s", supplier_id
                 )
                 continue
 
             logger.info(
-                f"Routing email to negotiation: {ng_id}, supplier: {supplier_id}"
+                "Routing email to negotiation: %s, supplier: %s", ng_id, supplier_id
             )
 
             # Create event and push to router
@@ -343,27 +376,38 @@ async def email_watcher():
                 ng_id=ng_id,
                 raw=email_data,
             )
-            logger.info(f"Pushing event to email_router...")
+            logger.info("Pushing event to email_router...")
             await email_router.push(event)
-            logger.info(f"Event pushed successfully")
+            logger.info("Event pushed successfully")
             logger.info("=" * 50)
 
     except asyncio.CancelledError:
         logger.info("Email watcher cancelled")
     except Exception as e:
-        logger.error(f"Email watcher error: {e}", exc_info=True)
+        logger.error("Email watcher error: %s", e, exc_info=True)
 
 
 email_watcher_task: asyncio.Task | None = None
+listing_refresh_task: asyncio.Task | None = None
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global pool, email_watcher_task
+    global pool, email_watcher_task, listing_refresh_task
     logger.info("Starting application...")
-    pool = await asyncpg.create_pool(DATABASE_URL, statement_cache_size=0)
+    pool = await asyncpg.create_pool(
+        DATABASE_URL,
+        min_size=DB_POOL_MIN,
+        max_size=DB_POOL_MAX,
+        max_inactive_connection_lifetime=300,
+        command_timeout=DB_COMMAND_TIMEOUT,
+        statement_cache_size=DB_STATEMENT_CACHE_SIZE,
+    )
     logger.info("Database pool created")
 
+    _listing_cache.clear()
+    listing_refresh_task = asyncio.create_task(refresh_listings())
+
     # Login email client if credentials are provided
     if EMAIL_ADDRESS and EMAIL_PASSWORD:
         try:
@@ -384,6 +428,12 @@ async def lifespan(app: FastAPI):
     yield
 
     logger.info("Shutting down...")
+    if listing_refresh_task:
+        listing_refresh_task.cancel()
+        try:
+            await listing_refresh_task
+        except asyncio.CancelledError:
+            pass
     if email_watcher_task:
         email_watcher_task.cancel()
         try:
@@ -391,6 +441,7 @@ async def lifespan(app: FastAPI):
         except asyncio.CancelledError:
             pass
         logger.info("Email watcher stopped")
+    await email_client.close()
     if pool:
         await pool.close()
         logger.info("Database pool closed")
@@ -410,7 +461,7 @@ app.add_middleware(
 )
 
 
-async def get_pool() -> asyncpg.Pool:
+def get_pool() -> asyncpg.Pool:
     if pool is None:
         raise RuntimeError("Database pool not initialized")
     return pool
@@ -421,68 +472,73 @@ async def health_check() -> dict[str, str]:
     return {"status": "ok"}
 
 
-@app.get("/suppliers")
-async def list_suppliers() -> list[dict[str, Any]]:
-    db = await get_pool()
-    rows = await db.fetch("SELECT * FROM supplier")
-    return [dict(row) for row in rows]
-
-
-@app.get("/products")
-async def list_products() -> list[dict[str, Any]]:
-    db = await get_pool()
-    rows = await db.fetch("SELECT * FROM product")
-    return [dict(row) for row in rows]
-
-
-@app.get("/search")
-async def search_items(product: str) -> list[dict[str, Any]]:
-    db = await get_pool()
-    rows = await db.fetch(
-        "SELECT * FROM product WHERE product_name ILIKE $1", f"%{product}%"
+def _json_agg(query: str) -> str:
+    """Wrap a SELECT so Postgres returns all of its rows as one JSON array."""
+    return f"SELECT COALESCE(json_agg(t), '[]'::json) FROM ({query}) t"
+
+
+# Supplier and product catalogues change rarely but are polled by the UI, so
+# they are served from a snapshot that a background task refreshes
+LISTING_REFRESH_SECONDS = 60
+_LISTING_SQL = {
+    "suppliers": _json_agg(
+        "SELECT supplier_id, supplier_name, supplier_email, description, insights, image_url FROM supplier"
+    ),
+    "products": _json_agg(
+        "SELECT product_id, supplier_id, product_name, supplier_name FROM product"
+    ),
+}
+# name -> (JSON payload, ETag)
+_listing_cache: dict[str, tuple[str, str]] = {}
+
+
+async def _load_listing(name: str) -> tuple[str, str]:
+    payload = await get_pool().fetchval(_LISTING_SQL[name])
+    etag = f'"{hashlib.sha1(payload.encode()).hexdigest()}"'
+    _listing_cache[name] = (payload, etag)
+    return payload, etag
+
+
+async def refresh_listings() -> None:
+    """Background task that reloads the cached listings periodically."""
+    while True:
+        await asyncio.sleep(LISTING_REFRESH_SECONDS)
+        for name in _LISTING_SQL:
+            try:
+                await _load_listing(name)
+            except Exception as e:
+                logger.warning(f"Failed to refresh {name} listing: {e}")
+
+
+async def _listing_response(name: str, request: Request) -> Response:
+    payload, etag = _listing_cache.get(name) or await _load_listing(name)
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(
+        content=payload, media_type="application/json", headers={"ETag": etag}
     )
-    return [dict(row) for row in rows]
 
 
-def call_bedrock(prompt: str, system_prompt: str = "") -> str:
-    """Call Amazon Bedrock gpt-oss-120b model and return response text."""
-    messages = [{"role": "user", "content": prompt}]
-    if system_prompt:
-        messages.insert(0, {"role": "system", "content": system_prompt})
-
-    body = {
-        "messages": messages,
-        "max_tokens": 1024,
-        "temperature": 0.7,
-    }
+@app.get("/suppliers")
+async def list_suppliers(request: Request) -> Response:
+    return await _listing_response("suppliers", request)
 
-    try:
-        response = bedrock_client.invoke_model(
-            modelId="openai.gpt-oss-120b-1:0",
-            contentType="application/json",
-            accept="application/json",
-            body=json.dumps(body),
-        )
-    except Exception as e:
-        return f"Bedrock service is currently unavailable. {e}"
 
-    result = json.loads(response["body"].read())
-    return result["choices"][0]["message"]["content"]
+@app.get("/products")
+async def list_products(request: Request) -> Response:
+    return await _listing_response("products", request)
 
 
-# FIXED SYNTAX ERROR HERE
-async def crate_negotiation_agent(supplier_id: str, tactics: str, product: str) -> str:
-    db = await get_pool()
-    row = await db.fetch(
-        "SELECT * FROM supplier WHERE supplier_name = $1 LIMIT 1", supplier_id
+@app.get("/search")
+async def search_items(product: str) -> Response:
+    db = get_pool()
+    payload = await db.fetchval(
+        _json_agg(
+            "SELECT product_id, supplier_id, product_name, supplier_name FROM product WHERE product_name ILIKE $1"
+        ),
+        f"%{product}%",
     )
-    if not row:
-        return ""
-    insights = row[0]["insights"]
-    prompt = f"""
-    Negotiate for {product} with tactics {tactics}. Insights: {insights}
-    """
-    return prompt
+    return Response(content=payload, media_type="application/json")
 
 
 # --- NEW EMAIL ENDPOINTS ---
@@ -533,34 +589,80 @@ class NegotiationRequest(BaseModel):
     suppliers: list[str]
 
 
+async def _send_initial_message(
+    supplier: str, agent: NegotiationAgent, context: str
+) -> None:
+    """Send the opening message to one supplier asking about offers."""
+    logger.info("Sending initial message to supplier %s...", supplier)
+    reply = await agent.send_initial_message(context=context)
+    logger.info("Initial message sent to supplier %s", supplier)
+    # Formatted only when DEBUG is enabled
+    logger.debug("Message content: %.100s", reply)
+
+
+async def _send_initial_messages(
+    ng_id: str, agents: list[tuple[str, NegotiationAgent]], context: str
+) -> None:
+    """Send every opening message concurrently; one failure doesn't stop the rest."""
+    results = await asyncio.gather(
+        *(
+            _send_initial_message(supplier, agent, context)
+            for supplier, agent in agents
+        ),
+        return_exceptions=True,
+    )
+    for (supplier, _), result in zip(agents, results):
+        if isinstance(result, Exception):
+            logger.error(
+                f"Initial message to supplier {supplier} in negotiation {ng_id} failed: {result}"
+            )
+
+
 @app.post("/negotiate")
-async def trigger_negotiations(request: NegotiationRequest) -> dict[str, Any]:
+async def trigger_negotiations(
+    request: NegotiationRequest, background_tasks: BackgroundTasks
+) -> dict[str, Any]:
     logger.info(f"Starting negotiation for product: {request.product}")
     logger.info(f"Suppliers: {request.suppliers}")
     logger.info(f"Tactics: {request.tactics}")
 
-    db = await get_pool()
+    # Rows are matched back by their canonical text form, so requested IDs
+    # (any case, braces or hyphenation Postgres accepts) are normalised first
+    try:
+        supplier_ids = [str(uuid.UUID(supplier)) for supplier in request.suppliers]
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid supplier id: {e}")
+
+    db = get_pool()
 
     ng_id = str(uuid.uuid4())
     logger.info(f"Created negotiation ID: {ng_id}")
 
-    # Save negotiation to DB
-    await db.execute(
-        """
-        INSERT INTO negotiation (ng_id, product, strategy, status)
-        VALUES ($1, $2, $3, 'active')
-        """,
-        ng_id,
-        request.product,
-        request.tactics,
+    # Save negotiation and fetch all supplier rows concurrently; they are
+    # independent round-trips
+    _, supplier_rows = await asyncio.gather(
+        db.execute(
+            """
+            INSERT INTO negotiation (ng_id, product, strategy, status)
+            VALUES ($1, $2, $3, 'active')
+            """,
+            ng_id,
+            request.product,
+            request.tactics,
+        ),
+        db.fetch(
+            "SELECT supplier_id, supplier_name, supplier_email, insights FROM supplier WHERE supplier_id = ANY($1::uuid[])",
+            supplier_ids,
+        ),
     )
     logger.info("Negotiation saved to database")
+    suppliers_by_id = {str(row["supplier_id"]): row for row in supplier_rows}
 
     orchestrator = OrchestratorAgent(
         client=bedrock_client,
         strategy=request.tactics,
         product=request.product,
-        sys_promt=OCHESTRATOR_AGENT_SYSTEM_PROMPT,
+        sys_prompt=OCHESTRATOR_AGENT_SYSTEM_PROMPT,
         db_pool=db,
         ng_id=ng_id,
     )
@@ -576,36 +678,22 @@ async def trigger_negotiations(request: NegotiationRequest) -> dict[str, Any]:
     )
     logger.info("Negotiation session created")
 
-    for supplier in request.suppliers:
-        logger.info(f"Processing supplier: {supplier}")
+    agents: list[tuple[str, NegotiationAgent]] = []
+    for supplier in supplier_ids:
+        logger.info("Processing supplier: %s", supplier)
 
-        # Fetch supplier info from DB
-        supplier_row = await db.fetchrow(
-            "SELECT supplier_name, supplier_email, description, insights FROM supplier WHERE supplier_id = $1",
-            supplier,
-        )
+        supplier_row = suppliers_by_id.get(supplier)
         if not supplier_row:
             logger.warning(f"Supplier {supplier} not found in database, skipping")
             continue
 
         supplier_name = supplier_row["supplier_name"] or "Supplier"
         supplier_email = supplier_row["supplier_email"]
-        supplier_description = supplier_row["description"] or ""
         supplier_insights = supplier_row["insights"] or ""
 
-        logger.info(f"Supplier: {supplier_name}, email: {supplier_email or 'NOT SET'}")
-
-        # Save negotiator agent to DB
-        await db.execute(
-            """
-            INSERT INTO agent (ng_id, sup_id, sys_prompt, role)
-            VALUES ($1, $2, $3, 'negotiator')
-            """,
-            ng_id,
-            supplier,
-            NEGOTIATOR_AGENT_SYSTEM_PROMPT,
+        logger.info(
+            "Supplier: %s, email: %s", supplier_name, supplier_email or "NOT SET"
         )
-        logger.info(f"Agent saved to database for supplier {supplier}")
 
         agent = NegotiationAgent(
             db_pool=db,
@@ -619,24 +707,30 @@ async def trigger_negotiations(request: NegotiationRequest) -> dict[str, Any]:
             supplier_name=supplier_name,
             supplier_insights=supplier_insights,
         )
-        logger.info(f"NegotiationAgent created for supplier {supplier}")
+        logger.info("NegotiationAgent created for supplier %s", supplier)
 
         # Register agent with session - this sets up the email handler
         session.add_agent(supplier, agent)
-        logger.info(f"Agent registered with session for supplier {supplier}")
-
-        # Send initial message to supplier asking about offers
-        logger.info(f"Sending initial message to supplier {supplier}...")
-        reply = await agent.send_initial_message(context=request.prompt)
-        logger.info(f"Initial message sent to supplier {supplier}")
-        logger.debug(
-            f"Message content: {reply[:100]}..."
-            if len(reply) > 100
-            else f"Message content: {reply}"
-        )
+        logger.info("Agent registered with session for supplier %s", supplier)
+        agents.append((supplier, agent))
+
+    # Save all negotiator agents to DB in one batch
+    await db.executemany(
+        """
+        INSERT INTO agent (ng_id, sup_id, sys_prompt, role)
+        VALUES ($1, $2, $3, 'negotiator')
+        """,
+        [(ng_id, supplier, NEGOTIATOR_AGENT_SYSTEM_PROMPT) for supplier, _ in agents],
+    )
+    logger.info(f"{len(agents)} agents saved to database")
 
     # Store session for later reference
     active_sessions[ng_id] = session
+    active_sessions_by_prefix[ng_id[:8]] = ng_id
+
+    # Opening messages take a Bedrock round-trip each, so they are sent after
+    # the response has gone out rather than holding the request open
+    background_tasks.add_task(_send_initial_messages, ng_id, agents, request.prompt)
     logger.info(
         f"Negotiation {ng_id} started successfully with {len(request.suppliers)} suppliers"
     )
@@ -649,112 +743,109 @@ async def trigger_negotiations(request: NegotiationRequest) -> dict[str, Any]:
 
 
 @app.get("/conversation/{negotiation_id}/{supplier_id}")
-async def get_conversation(negotiation_id: str, supplier_id: str) -> dict[str, Any]:
-    db = await get_pool()
-    messages = await db.fetch(
-        "SELECT * FROM message WHERE ng_id = $1 AND supplier_id = $2",
+async def get_conversation(negotiation_id: str, supplier_id: str) -> Response:
+    db = get_pool()
+    # metadata stays a JSON string, as asyncpg returned it for jsonb
+    messages = await db.fetchval(
+        _json_agg(
+            """
+            SELECT message_id, ng_id, supplier_id, message_timestamp, role,
+                   message_text, metadata::text AS metadata, completed
+            FROM message
+            WHERE ng_id = $1 AND supplier_id = $2
+            """
+        ),
         negotiation_id,
         supplier_id,
     )
-    return {"message": [dict(message) for message in messages]}
+    return Response(content=f'{{"message": {messages}}}', media_type="application/json")
 
 
 @app.get("/negotiation_status/{negotiation_id}")
-async def negotiation_status(negotiation_id: str) -> dict[str, Any]:
-    db = await get_pool()
-    rows = await db.fetch("SELECT * FROM agent WHERE ng_id = $1", negotiation_id)
-
-    response = []
-    for row in rows:
-        messages = await db.fetch(
-            "SELECT * FROM message WHERE ng_id = $1 AND supplier_id = $2 ORDER BY message_timestamp DESC",
-            negotiation_id,
-            row["sup_id"],
-        )
-
-        # Check if any message in this conversation is marked as completed
-        is_completed = any(msg.get("completed", False) for msg in messages)
-
-        # Get supplier name
-        supplier = await db.fetchrow(
-            "SELECT supplier_name FROM supplier WHERE supplier_id = $1",
-            row["sup_id"],
+async def negotiation_status(negotiation_id: str) -> Response:
+    db = get_pool()
+    # One round-trip: per-agent counts and the overall completion flag are
+    # aggregated and encoded by Postgres
+    payload = await db.fetchval(
+        """
+        WITH agents AS (
+            SELECT a.sup_id,
+                   s.supplier_name,
+                   COUNT(m.ng_id) AS message_count,
+                   COALESCE(bool_or(m.completed), false) AS completed
+            FROM agent a
+            LEFT JOIN supplier s ON s.supplier_id = a.sup_id
+            LEFT JOIN message m ON m.ng_id = a.ng_id AND m.supplier_id = a.sup_id
+            WHERE a.ng_id = $1::uuid
+            GROUP BY a.sup_id, s.supplier_name
         )
-
-        response.append(
-            {
-                "supplier_id": str(row["sup_id"]),
-                "supplier_name": supplier["supplier_name"] if supplier else None,
-                "message_count": len(messages),
-                "completed": is_completed,
-            }
+        SELECT json_build_object(
+            'negotiation_id', $1::text,
+            'all_completed', COALESCE(bool_and(completed), false),
+            'agents', COALESCE(
+                json_agg(
+                    json_build_object(
+                        'supplier_id', sup_id::text,
+                        'supplier_name', supplier_name,
+                        'message_count', message_count,
+                        'completed', completed
+                    )
+                ),
+                '[]'::json
+            )
         )
-
-    # Check if all supplier negotiations are completed
-    all_completed = all(agent["completed"] for agent in response) if response else False
-
-    return {
-        "negotiation_id": negotiation_id,
-        "all_completed": all_completed,
-        "agents": response,
-    }
+        FROM agents
+        """,
+        negotiation_id,
+    )
+    return Response(content=payload, media_type="application/json")
 
 
 @app.get("/orchestrator_activity/{negotiation_id}")
 async def get_orchestrator_activity(
     negotiation_id: str, supplier_id: Optional[str] = None
-) -> dict[str, Any]:
-    db = await get_pool()
-    params: list[Any] = [negotiation_id]
-    query = """
-        SELECT oa.activity_id,
-               oa.ng_id,
-               oa.supplier_id,
-               oa.activity_timestamp,
-               oa.action,
-               oa.summary,
-               oa.details,
-               oa.completed,
-               s.supplier_name
+) -> Response:
+    db = get_pool()
+    # Postgres shapes and encodes the payload, so rows never become Python dicts
+    payload = await db.fetchval(
+        """
+        SELECT json_build_object(
+            'negotiation_id', $1::text,
+            'count', COUNT(*),
+            'activities', COALESCE(
+                json_agg(
+                    json_build_object(
+                        'activity_id', oa.activity_id::text,
+                        'supplier_id', oa.supplier_id::text,
+                        'supplier_name', s.supplier_name,
+                        'action', oa.action,
+                        'summary', oa.summary,
+                        'details', oa.details,
+                        'completed', oa.completed,
+                        'timestamp', oa.activity_timestamp
+                    )
+                    ORDER BY oa.activity_timestamp DESC
+                ),
+                '[]'::json
+            )
+        )
         FROM orchestrator_activity oa
         LEFT JOIN supplier s ON oa.supplier_id = s.supplier_id
-        WHERE oa.ng_id = $1
-    """
-    if supplier_id:
-        query += " AND oa.supplier_id = $2"
-        params.append(supplier_id)
-    query += " ORDER BY oa.activity_timestamp DESC"
-
-    rows = await db.fetch(query, *params)
-    activities = []
-    for row in rows:
-        activities.append(
-            {
-                "activity_id": str(row["activity_id"]),
-                "supplier_id": str(row["supplier_id"]) if row["supplier_id"] else None,
-                "supplier_name": row["supplier_name"],
-                "action": row["action"],
-                "summary": row["summary"],
-                "details": row["details"],
-                "completed": row["completed"],
-                "timestamp": row["activity_timestamp"].isoformat()
-                if row["activity_timestamp"]
-                else None,
-            }
-        )
-
-    return {
-        "negotiation_id": negotiation_id,
-        "count": len(activities),
-        "activities": activities,
-    }
+        WHERE oa.ng_id = $1::uuid
+          AND ($2::uuid IS NULL OR oa.supplier_id = $2::uuid)
+        """,
+        negotiation_id,
+        # An empty ?supplier_id= means no filter, as before
+        supplier_id or None,
+    )
+    return Response(content=payload, media_type="application/json")
 
 
 @app.get("/negotiation_summary/{negotiation_id}/{supplier_id}")
 async def get_negotiation_summary(
     negotiation_id: str, supplier_id: Optional[str] = None
 ) -> dict[str, Any]:
-    db = await get_pool()
+    db = get_pool()
     params: list[Any] = [negotiation_id]
     query = """
         SELECT ns.summary_id,
@@ -798,7 +889,7 @@ async def get_negotiation_summary(
 
 @app.get("/negotiation_overview/{negotiation_id}")
 async def get_negotiation_overview(negotiation_id: str) -> dict[str, Any]:
-    db = await get_pool()
+    db = get_pool()
     negotiation = await db.fetchrow(
         "SELECT ng_id, product, strategy FROM negotiation WHERE ng_id = $1",
         negotiation_id,
@@ -820,22 +911,16 @@ async def get_negotiation_overview(negotiation_id: str) -> dict[str, Any]:
 
 
 @app.get("/get_negotations")
-async def get_negotations() -> dict[str, Any]:
-    db = await get_pool()
-    rows = await db.fetch("SELECT * FROM negotiation")
-
-    response = []
-    for row in rows:
-        response.append(
-            {
-                "negotiation_id": str(row["ng_id"]),
-                "product": row["product"],
-                "strategy": row["strategy"],
-                "status": row["status"],
-            }
+async def get_negotations() -> Response:
+    db = get_pool()
+    negotiations = await db.fetchval(
+        _json_agg(
+            "SELECT ng_id AS negotiation_id, product, strategy, status FROM negotiation"
         )
-
-    return {"negotiations": response}
+    )
+    return Response(
+        content=f'{{"negotiations": {negotiations}}}', media_type="application/json"
+    )
 
 
 def main() -> None:
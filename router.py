@@ -2,15 +2,30 @@ from typing import Any, Callable, Coroutine
 from dataclasses import dataclass, field
 import asyncio
 import logging
+import sys
 
 from agents import NegotiationAgent, OrchestratorAgent
 
 logger = logging.getLogger("negotiation.router")
 
+INSERT_SUPPLIER_MESSAGE_SQL = """
+    INSERT INTO message (ng_id, supplier_id, role, message_text)
+    VALUES ($1, $2, $3, $4)
+"""
+# Emails arriving within this window (or up to this many) share one insert
+# round-trip and one orchestrator pass
+EMAIL_BATCH_SIZE = 32
+EMAIL_BATCH_WINDOW = 0.05
+# Handlers in flight across all sessions; further pushes wait for a free slot
+MAX_CONCURRENT_HANDLERS = 32
 
-@dataclass
+
+@dataclass(slots=True, frozen=True)
 class EmailEvent:
-    """Represents an incoming email event. Extend fields as needed for your provider."""
+    """Represents an incoming email event. Extend fields as needed for your provider.
+
+    Slotted and immutable: one is built per inbound email and never modified.
+    """
 
     sender: str
     subject: str
@@ -20,9 +35,18 @@ class EmailEvent:
     raw: dict[str, Any] = field(default_factory=dict)  # Store provider-specific data
 
 
-def _make_key(ng_id: str, supplier_id: str) -> str:
-    """Create a unique key for a negotiation + supplier pair."""
-    return f"{ng_id}:{supplier_id}"
+EmailHandler = Callable[[EmailEvent], Coroutine[Any, Any, None]]
+
+
+class _HandlerMap(dict[tuple[str, str], EmailHandler]):
+    """Handler registry whose misses resolve to the default handler."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.default: EmailHandler | None = None
+
+    def __missing__(self, key: tuple[str, str]) -> EmailHandler | None:
+        return self.default
 
 
 class EmailEventRouter:
@@ -33,71 +57,75 @@ class EmailEventRouter:
     1. Register handlers by (ng_id, supplier_id) pair
     2. When email arrives, call push() with EmailEvent
     3. Router looks up handler by composite key and spawns async task
+       (at most MAX_CONCURRENT_HANDLERS at once; push() waits for a slot)
     """
 
     def __init__(self):
-        self._handlers: dict[
-            str, Callable[[EmailEvent], Coroutine[Any, Any, None]]
-        ] = {}
-        self._default_handler: (
-            Callable[[EmailEvent], Coroutine[Any, Any, None]] | None
-        ) = None
+        # Keyed by (ng_id, supplier_id); tuples of existing strs hash without
+        # formatting a new key per event. Unknown keys yield the default handler
+        self._handlers = _HandlerMap()
+        self._slots = asyncio.Semaphore(MAX_CONCURRENT_HANDLERS)
+        # The loop only keeps weak references to tasks, so in-flight handlers
+        # are held here until they finish
+        self._pending: set[asyncio.Task] = set()
 
     def register(
         self,
         ng_id: str,
         supplier_id: str,
-        handler: Callable[[EmailEvent], Coroutine[Any, Any, None]],
+        handler: EmailHandler,
     ) -> None:
         """Register a handler for a specific (ng_id, supplier_id) pair."""
-        key = _make_key(ng_id, supplier_id)
+        # Registered keys live for the whole session; interning them keeps a
+        # single canonical copy of each id however many times it is registered
+        key = (sys.intern(ng_id), sys.intern(supplier_id))
         self._handlers[key] = handler
-        logger.info(f"Registered handler for key: {key}")
+        logger.info("Registered handler for key: %s", key)
 
-    def set_default_handler(
-        self, handler: Callable[[EmailEvent], Coroutine[Any, Any, None]]
-    ) -> None:
+    def set_default_handler(self, handler: EmailHandler) -> None:
         """Set a fallback handler for unmatched events."""
-        self._default_handler = handler
+        self._handlers.default = handler
 
     def unregister(self, ng_id: str, supplier_id: str) -> None:
         """Remove a handler for a (ng_id, supplier_id) pair."""
-        key = _make_key(ng_id, supplier_id)
-        self._handlers.pop(key, None)
+        self._handlers.pop((ng_id, supplier_id), None)
 
-    async def push(self, event: EmailEvent) -> None:
+    async def push(self, event: EmailEvent) -> asyncio.Task | None:
         """
         Push an email event to be routed.
         Looks up handler by (ng_id, supplier_id) and spawns async task.
+        Returns the handler task, or None if no handler matched.
         """
         logger.info(
-            f"Router.push() called with ng_id={event.ng_id}, supplier_id={event.supplier_id}"
+            "Router.push() called with ng_id=%s, supplier_id=%s",
+            event.ng_id,
+            event.supplier_id,
         )
-        logger.info(f"Available handler keys: {list(self._handlers.keys())}")
-
-        handler = None
-
-        if event.ng_id and event.supplier_id:
-            key = _make_key(event.ng_id, event.supplier_id)
-            logger.info(f"Looking up handler for key: {key}")
-            handler = self._handlers.get(key)
-            if handler:
-                logger.info(f"Found handler for key: {key}")
-            else:
-                logger.warning(f"No handler found for key: {key}")
-
-        if not handler and self._default_handler:
-            logger.info("Using default handler")
-            handler = self._default_handler
+        logger.debug("Registered handlers: %d", len(self._handlers))
 
-        if handler:
-            logger.info("Spawning async task for handler...")
-            asyncio.create_task(handler(event))
-            logger.info("Handler task spawned")
-        else:
+        # Events missing either id can never match a registered key, so they
+        # fall through to the default handler as well
+        handler = self._handlers[(event.ng_id, event.supplier_id)]
+        if handler is None:
+            # Dropped event: no slot, task or coroutine is created
             logger.warning(
-                f"No handler found for event - ng_id={event.ng_id}, supplier_id={event.supplier_id}"
+                "No handler found for event - ng_id=%s, supplier_id=%s",
+                event.ng_id,
+                event.supplier_id,
             )
+            return None
+
+        logger.info("Spawning async task for handler...")
+        await self._slots.acquire()
+        task = asyncio.create_task(handler(event))
+        self._pending.add(task)
+        task.add_done_callback(self._handler_done)
+        logger.info("Handler task spawned")
+        return task
+
+    def _handler_done(self, task: asyncio.Task) -> None:
+        self._pending.discard(task)
+        self._slots.release()
 
 
 class NegotiationSession:
@@ -122,71 +150,133 @@ class NegotiationSession:
         self.orchestrator = orchestrator
         self.router = router
         self._agents: dict[str, NegotiationAgent] = {}
+        self._pending: asyncio.Queue[
+            tuple[str, NegotiationAgent, EmailEvent, asyncio.Future[None]]
+        ] = asyncio.Queue()
+        self._batcher: asyncio.Task | None = None
+        # Bound once so every registration shares a single method object
+        self._handler = self._handle_event
 
     def add_agent(self, supplier_id: str, agent: NegotiationAgent) -> None:
-        """Add a negotiation agent and register its email handler."""
+        """Add a negotiation agent and register the session's email handler."""
         self._agents[supplier_id] = agent
-        self.router.register(self.ng_id, supplier_id, self._make_handler(supplier_id))
-
-    def _make_handler(
-        self, supplier_id: str
-    ) -> Callable[[EmailEvent], Coroutine[Any, Any, None]]:
-        """Create an email handler for a specific supplier."""
+        # Every supplier key maps to the same bound method; the agent is looked
+        # up per event instead of being captured in a per-supplier closure
+        self.router.register(self.ng_id, supplier_id, self._handler)
 
-        async def handler(event: EmailEvent) -> None:
-            logger.info(
-                f"[Session {self.ng_id}] Handler triggered for supplier {supplier_id}"
+    async def _handle_event(self, event: EmailEvent) -> None:
+        """Queue an email for the agent of the supplier it came from."""
+        supplier_id = event.supplier_id
+        agent = self._agents.get(supplier_id)
+        if agent is None:
+            logger.error(
+                "[Session %s] No agent found for supplier %s", self.ng_id, supplier_id
             )
-            logger.info(f"[Session {self.ng_id}] Email subject: {event.subject}")
-            logger.info(
-                f"[Session {self.ng_id}] Email body preview: {event.body[:200] if event.body else '(empty)'}..."
+            return
+        logger.info(
+            "[Session %s] Handler triggered for supplier %s", self.ng_id, supplier_id
+        )
+        logger.info("[Session %s] Email subject: %s", self.ng_id, event.subject)
+        logger.info(
+            "[Session %s] Email body preview: %s...",
+            self.ng_id,
+            event.body[:200] if event.body else "(empty)",
+        )
+
+        # Queue the email for the next batch and wait until it is handled
+        done = asyncio.get_running_loop().create_future()
+        self._pending.put_nowait((supplier_id, agent, event, done))
+        if self._batcher is None or self._batcher.done():
+            self._batcher = asyncio.create_task(self._drain())
+        await done
+
+    async def _drain(self) -> None:
+        """Process queued emails in batches until the queue is empty."""
+        loop = asyncio.get_running_loop()
+        while not self._pending.empty():
+            batch = [self._pending.get_nowait()]
+            deadline = loop.time() + EMAIL_BATCH_WINDOW
+            while len(batch) < EMAIL_BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(
+                        await asyncio.wait_for(self._pending.get(), timeout)
+                    )
+                except TimeoutError:
+                    break
+
+            try:
+                await self._process_batch(batch)
+            except Exception as e:
+                for *_, done in batch:
+                    if not done.done():
+                        done.set_exception(e)
+            else:
+                for *_, done in batch:
+                    if not done.done():
+                        done.set_result(None)
+
+    async def _process_batch(
+        self,
+        batch: list[tuple[str, NegotiationAgent, EmailEvent, asyncio.Future[None]]],
+    ) -> None:
+        # 1. Store the incoming messages in DB
+        logger.info(
+            "[Session %s] Saving %d supplier message(s) to database...",
+            self.ng_id,
+            len(batch),
+        )
+        await self.db_pool.executemany(
+            INSERT_SUPPLIER_MESSAGE_SQL,
+            [
+                (self.ng_id, supplier_id, "supplier", event.body)
+                for supplier_id, _, event, _ in batch
+            ],
+        )
+        logger.info("[Session %s] Supplier messages saved", self.ng_id)
+
+        # 2. Orchestrator revises strategy for all agents, once per batch
+        logger.info(
+            "[Session %s] Calling orchestrator.generate_new_instructions()...",
+            self.ng_id,
+        )
+        completion_status = await self.orchestrator.generate_new_instructions()
+        logger.info("[Session %s] Orchestrator instructions updated", self.ng_id)
+
+        # 3. Each supplier that wrote in gets one response
+        agents = {supplier_id: agent for supplier_id, agent, _, _ in batch}
+        await asyncio.gather(
+            *(
+                self._respond(supplier_id, agent, completion_status)
+                for supplier_id, agent in agents.items()
             )
+        )
 
-            # 1. Store the incoming message in DB
+    async def _respond(
+        self,
+        supplier_id: str,
+        agent: NegotiationAgent,
+        completion_status: dict[str, bool],
+    ) -> None:
+        # Check if this supplier's negotiation is completed
+        if completion_status.get(supplier_id, False):
             logger.info(
-                f"[Session {self.ng_id}] Saving supplier message to database..."
-            )
-            await self.db_pool.execute(
-                """
-                INSERT INTO message (ng_id, supplier_id, role, message_text)
-                VALUES ($1, $2, $3, $4)
-                """,
+                "[Session %s] Negotiation with supplier %s is COMPLETED - not sending follow-up",
                 self.ng_id,
                 supplier_id,
-                "supplier",
-                event.body,
             )
-            logger.info(f"[Session {self.ng_id}] Supplier message saved")
+            return
 
-            # 2. Orchestrator revises strategy for all agents
-            logger.info(
-                f"[Session {self.ng_id}] Calling orchestrator.generate_new_instructions()..."
-            )
-            completion_status = await self.orchestrator.generate_new_instructions()
-            logger.info(f"[Session {self.ng_id}] Orchestrator instructions updated")
-
-            # 3. Check if this supplier's negotiation is completed
-            is_completed = completion_status.get(supplier_id, False)
-            if is_completed:
-                logger.info(
-                    f"[Session {self.ng_id}] Negotiation with supplier {supplier_id} is COMPLETED - not sending follow-up"
-                )
-                return
-
-            # 4. Agent for this supplier sends response
-            agent = self._agents.get(supplier_id)
-            if agent:
-                logger.info(
-                    f"[Session {self.ng_id}] Calling agent.send_message() for supplier {supplier_id}..."
-                )
-                await agent.send_message()
-                logger.info(f"[Session {self.ng_id}] Agent response sent")
-            else:
-                logger.error(
-                    f"[Session {self.ng_id}] No agent found for supplier {supplier_id}"
-                )
-
-        return handler
+        # Agent for this supplier sends response
+        logger.info(
+            "[Session %s] Calling agent.send_message() for supplier %s...",
+            self.ng_id,
+            supplier_id,
+        )
+        await agent.send_message()
+        logger.info("[Session %s] Agent response sent", self.ng_id)
 
     def cleanup(self) -> None:
         """Unregister all handlers when session ends."""
@@ -135,3 +135,22 @@ BEGIN
     ALTER TABLE orchestrator_activity ADD CONSTRAINT orchestrator_activity_ng_sup_unique UNIQUE (ng_id, supplier_id);
 EXCEPTION WHEN duplicate_object THEN NULL;
 END $$;
+
+-- Per-turn history lookups filter on (ng_id, supplier_id) and order by time
+CREATE INDEX IF NOT EXISTS idx_message_ng_sup_ts
+    ON message (ng_id, supplier_id, message_timestamp);
+
+-- Orchestrator's own conversation is stored with supplier_id NULL
+CREATE INDEX IF NOT EXISTS idx_message_ng_ts_orchestrator
+    ON message (ng_id, message_timestamp) WHERE supplier_id IS NULL;
+
+-- Inbound emails reference suppliers by the middle of their UUID
+-- ([REF-xxxxxxxx-yyyy-yyyy-yyyy]); negotiation prefixes use a range on the pkey
+CREATE INDEX IF NOT EXISTS idx_supplier_id_middle
+    ON supplier ((substr(supplier_id::text, 10, 14)));
+
+-- /search matches product names with ILIKE '%term%'; a trigram index lets the
+-- leading wildcard use an index instead of a sequential scan
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS idx_product_name_trgm
+    ON product USING GIN (product_name gin_trgm_ops);
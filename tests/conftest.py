@@ -9,14 +9,29 @@ class MockRecord(dict):
         return self.get(name)
 
 
+# Lightweight stand-in for AsyncMock when a test only needs an awaitable that
+# records its calls (no child mocks, no call introspection machinery)
+class AsyncSpy:
+    def __init__(self, return_value=None):
+        self.calls = []
+        self.return_value = return_value
+
+    async def __call__(self, *args, **kwargs):
+        self.calls.append((args, kwargs))
+        return self.return_value
+
+
 @pytest.fixture
 def mock_db_pool():
     pool = AsyncMock()
     connection = AsyncMock()
 
-    # Setup connection context manager
+    # Setup connection context manager (acquire() and transaction() are sync
+    # calls returning async context managers in asyncpg)
+    pool.acquire = MagicMock()
     pool.acquire.return_value.__aenter__.return_value = connection
     pool.acquire.return_value.__aexit__.return_value = None
+    connection.transaction = MagicMock()
 
     # Common fetch/execute mocks
     connection.fetch.return_value = []
@@ -25,6 +40,7 @@ def mock_db_pool():
     # Allow pool to be used directly like execute/fetch if the app does that
     pool.fetch = connection.fetch
     pool.execute = connection.execute
+    pool.executemany = connection.executemany
 
     return pool
 
@@ -1,7 +1,7 @@
 import pytest
 import json
-from unittest.mock import MagicMock, AsyncMock
-from agents import NegotiationAgent, OrchestratorAgent
+from unittest.mock import MagicMock, AsyncMock, patch
+from agents import NegotiationAgent, OrchestratorAgent, invoke_model, strip_reasoning_tokens
 from tests.conftest import MockRecord
 
 
@@ -12,8 +12,8 @@ async def test_negotiation_agent_send_message(mock_db_pool, mock_bedrock_client)
 
     # Mock DB history
     mock_db_pool.fetch.side_effect = [
-        [MockRecord(role="user", content="Previous msg")],  # messages
-        [MockRecord(content="Be tough")]  # instructions
+        [MockRecord(role="supplier", message_text="Previous msg", message_timestamp=1)],  # messages
+        [MockRecord(instructions="Be tough")]  # instructions
     ]
 
     # Mock Bedrock Response
@@ -33,42 +33,85 @@ async def test_negotiation_agent_send_message(mock_db_pool, mock_bedrock_client)
     body = json.loads(call_kwargs['body'])
     assert len(body['messages']) > 0
     assert body['messages'][0]['content'] == "sys_prompt"
+    assert body['messages'][1] == {"role": "user", "content": "Previous msg"}
+    assert body['messages'][2]['content'] == "Supervisor instruction: Be tough"
 
     # Verify DB update
     mock_db_pool.execute.assert_called()
 
 
+@pytest.mark.asyncio
+async def test_negotiation_agent_fetches_only_new_history(mock_db_pool, mock_bedrock_client):
+    agent = NegotiationAgent(mock_db_pool, mock_bedrock_client, "sys_prompt", "ng-1", "sup-1", "Widgets")
+
+    mock_db_pool.fetch.side_effect = [
+        [MockRecord(role="supplier", message_text="First", message_timestamp=1)],
+        [],
+        [MockRecord(role="negotiator", message_text="Reply", message_timestamp=2)],
+        [],
+    ]
+    mock_response_body = json.dumps({
+        "choices": [{"message": {"content": "ok"}}]
+    })
+    mock_bedrock_client.invoke_model.return_value = {"body": MagicMock(read=lambda: mock_response_body)}
+
+    await agent.send_message()
+    await agent.send_message()
+
+    # Second turn only asks for rows newer than the last one seen
+    history_call = mock_db_pool.fetch.call_args_list[2]
+    assert "message_timestamp > $3" in history_call[0][0]
+    assert history_call[0][1:] == ("ng-1", "sup-1", 1)
+
+    body = json.loads(mock_bedrock_client.invoke_model.call_args[1]["body"])
+    assert body["messages"][1:] == [
+        {"role": "user", "content": "First"},
+        {"role": "assistant", "content": "Reply"},
+    ]
+
+
 @pytest.mark.asyncio
 async def test_orchestrator_generate_instructions(mock_db_pool, mock_bedrock_client):
+    ng_id = "11111111-1111-4111-8111-111111111111"
+    sup_id = "22222222-2222-4222-8222-222222222222"
+
     # Setup
     orch = OrchestratorAgent(
         db_pool=mock_db_pool,
-        sys_promt="Sys",  # Note: typo in class definition being matched here
+        sys_prompt="Sys",
         strategy="Win",
         product="Widget",
-        ng_id="ng-1",
+        ng_id=ng_id,
         client=mock_bedrock_client
     )
 
     # Mock DB Data
-    # 1. All messages
+    # 1. Per-supplier history aggregated server-side (json_agg arrives as text)
     mock_db_pool.fetch.side_effect = [
         [
-            MockRecord(ng_id="ng-1", supplier_id="sup-1", role="supplier", message_text="Hi",
-                       message_timestamp=MagicMock(isoformat=lambda: "2023-01-01")),
+            MockRecord(
+                supplier_id=sup_id,
+                msgs=json.dumps([{"role": "supplier", "text": "Hi", "timestamp": "2023-01-01"}]),
+                instructions=None,
+            ),
         ],
-        # 2. Existing instructions
-        [],
-        # 3. Messages for _build_conversation context (Orchestrator history)
+        # 2. Messages for _build_conversation context (Orchestrator history)
         []
     ]
 
     # Mock LLM Response with strict Regex format required
-    llm_content = """
+    llm_content = f"""
     Here is the plan:
     [INSTRUCTION]
-    ng_id: ng-1
-    supplier_id: sup-1
+    ng_id: {ng_id}
+    supplier_id: {sup_id}
+    completed: false
+    text: Offer 15% less
+    [/INSTRUCTION]
+    [INSTRUCTION]
+    ng_id: {ng_id}
+    supplier_id: {sup_id}
+    completed: false
     text: Offer 10% less
     [/INSTRUCTION]
     """
@@ -79,10 +122,71 @@ async def test_orchestrator_generate_instructions(mock_db_pool, mock_bedrock_cli
     mock_bedrock_client.invoke_model.return_value = {"body": MagicMock(read=lambda: mock_response_body)}
 
     # Execute
-    await orch.generate_new_instructions()
+    status = await orch.generate_new_instructions()
 
-    # Verify DB Insert
-    mock_db_pool.execute.assert_called()
-    call_args = mock_db_pool.execute.call_args[0]
-    assert "INSERT INTO instructions" in call_args[0]
-    assert "Offer 10% less" in call_args
\ No newline at end of file
+    # Verify DB Insert (batched upsert, repeated block collapsed to the last one)
+    assert status == {sup_id: False}
+    mock_db_pool.executemany.assert_called_once()
+    sql, rows = mock_db_pool.executemany.call_args[0]
+    assert "INSERT INTO instructions" in sql
+    assert rows == [(sup_id, ng_id, "Offer 10% less")]
+
+
+def test_strip_reasoning_tokens():
+    text = "<Thinking>plan</THINKING>Hello\n\n\n\n<analysis>x\ny</analysis>Bye <think>a</thinking>"
+    assert strip_reasoning_tokens(text) == "Hello\n\nBye <think>a</thinking>"
+
+
+@pytest.mark.asyncio
+async def test_invoke_model_cache(mock_bedrock_client):
+    mock_response_body = json.dumps({
+        "choices": [{"message": {"content": "Summary"}}]
+    })
+    mock_bedrock_client.invoke_model.return_value = {"body": MagicMock(read=lambda: mock_response_body)}
+    body = {"messages": [{"role": "user", "content": "cache me"}], "max_tokens": 10, "temperature": 0.3}
+
+    assert await invoke_model(mock_bedrock_client, body, cache=True) == "Summary"
+    assert await invoke_model(mock_bedrock_client, dict(body), cache=True) == "Summary"
+    assert mock_bedrock_client.invoke_model.call_count == 1
+
+    # Uncached calls always reach the model
+    await invoke_model(mock_bedrock_client, body)
+    assert mock_bedrock_client.invoke_model.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_invoke_model_cache_expires(mock_bedrock_client):
+    mock_response_body = json.dumps({
+        "choices": [{"message": {"content": "Summary"}}]
+    })
+    mock_bedrock_client.invoke_model.return_value = {"body": MagicMock(read=lambda: mock_response_body)}
+    body = {"messages": [{"role": "user", "content": "expire me"}], "max_tokens": 10, "temperature": 0.3}
+
+    with patch("agents.time.monotonic", return_value=1000.0):
+        await invoke_model(mock_bedrock_client, body, cache=True)
+        await invoke_model(mock_bedrock_client, body, cache=True)
+    assert mock_bedrock_client.invoke_model.call_count == 1
+
+    with patch("agents.time.monotonic", return_value=1000.0 + 601):
+        await invoke_model(mock_bedrock_client, body, cache=True)
+    assert mock_bedrock_client.invoke_model.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_negotiation_agent_skips_email_when_save_fails(mock_db_pool, mock_bedrock_client):
+    email_client = MagicMock(email_send=AsyncMock())
+    agent = NegotiationAgent(
+        mock_db_pool, mock_bedrock_client, "sys_prompt", "ng-1", "sup-1", "Widgets",
+        email_client=email_client, supplier_email="sup@ex.com",
+    )
+    mock_db_pool.fetch.side_effect = [[], []]
+    mock_db_pool.execute.side_effect = RuntimeError("insert failed")
+    mock_response_body = json.dumps({
+        "choices": [{"message": {"content": "I offer $50"}}]
+    })
+    mock_bedrock_client.invoke_model.return_value = {"body": MagicMock(read=lambda: mock_response_body)}
+
+    # The supplier never receives a reply the stored conversation lacks
+    with pytest.raises(RuntimeError):
+        await agent.send_message()
+    email_client.email_send.assert_not_called()
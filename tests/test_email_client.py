@@ -1,7 +1,8 @@
 import pytest
 import asyncio
 from unittest.mock import patch, MagicMock, AsyncMock
-from email_client import EmailClient
+import aiosmtplib
+from email_client import EmailClient, _decode_part, _find_text_part, _parse_fetch_response
 
 
 @pytest.mark.asyncio
@@ -27,6 +28,9 @@ async def test_email_login():
         assert client.email_address == "user@test.com"
         mock_smtp.login.assert_called_with("user@test.com", "pass")
         mock_imap.login.assert_called_with("user@test.com", "pass")
+        # The verified SMTP session is kept for sending
+        mock_smtp.quit.assert_not_called()
+        assert client._smtp is mock_smtp
 
 
 @pytest.mark.asyncio
@@ -35,56 +39,197 @@ async def test_email_send():
     client.email_address = "user@test.com"
     client.password = "pass"
 
-    with patch("aiosmtplib.send", new_callable=AsyncMock) as mock_send:
+    with patch("aiosmtplib.SMTP") as mock_smtp_cls:
+        mock_smtp = mock_smtp_cls.return_value
+        mock_smtp.connect = AsyncMock()
+        mock_smtp.login = AsyncMock()
+        mock_smtp.send_message = AsyncMock()
+        mock_smtp.is_connected = True
+
         await client.email_send("target@test.com", "Subj", "Body")
+        await client.email_send("target@test.com", "Subj 2", "Body")
 
-        mock_send.assert_called_once()
-        args, kwargs = mock_send.call_args
-        assert kwargs['username'] == "user@test.com"
-        assert kwargs['password'] == "pass"
-        msg = args[0]
+        # One session is opened and reused for both messages
+        mock_smtp_cls.assert_called_once()
+        mock_smtp.login.assert_called_once_with("user@test.com", "pass")
+        assert mock_smtp.send_message.call_count == 2
+        msg = mock_smtp.send_message.call_args_list[0][0][0]
         assert msg['Subject'] == "Subj"
 
 
+@pytest.mark.asyncio
+async def test_email_send_reconnects_after_disconnect():
+    client = EmailClient()
+    client.email_address = "user@test.com"
+    client.password = "pass"
+
+    with patch("aiosmtplib.SMTP") as mock_smtp_cls:
+        mock_smtp = mock_smtp_cls.return_value
+        mock_smtp.connect = AsyncMock()
+        mock_smtp.login = AsyncMock()
+        mock_smtp.quit = AsyncMock()
+        mock_smtp.is_connected = True
+        mock_smtp.send_message = AsyncMock(
+            side_effect=[aiosmtplib.SMTPServerDisconnected("gone"), None]
+        )
+
+        await client.email_send("target@test.com", "Subj", "Body")
+
+        assert mock_smtp_cls.call_count == 2
+        assert mock_smtp.send_message.call_count == 2
+
+        # Shutdown closes the live session
+        await client.close()
+        assert mock_smtp.quit.await_count == 2
+
+
 @pytest.mark.asyncio
 async def test_email_trigger():
     client = EmailClient()
     client.email_address = "me"
     client.password = "pass"
+    client.watch_folders = ["INBOX"]
 
     with patch("aioimaplib.IMAP4_SSL") as mock_imap_cls:
         mock_imap = mock_imap_cls.return_value
         mock_imap.wait_hello_from_server = AsyncMock()
         mock_imap.login = AsyncMock()
-        mock_imap.select = AsyncMock(return_value=("OK", [b'1']))
-
-        # We need enough mock returns for the loop:
-        # Pass 1 (Init): Check INBOX, Check Junk -> Sleep
-        # Pass 2 (Run):  Check INBOX, Check Junk -> Sleep -> Cancel
+        mock_imap.logout = AsyncMock()
+        # The snapshot comes from SELECT's UIDNEXT, no SEARCH needed
+        mock_imap.select = AsyncMock(return_value=("OK", [
+            b'122 EXISTS',
+            b'OK [UIDVALIDITY 7] UIDs valid',
+            b'OK [UIDNEXT 123] Predicted next UID',
+            b'[READ-WRITE] SELECT completed',
+        ]))
+        mock_imap.has_capability = MagicMock(return_value=True)
+
+        mock_imap.uid_search = AsyncMock(side_effect=[
+            ("OK", [b"122"]),  # 1. Before IDLE (nothing new; n:* matches the newest)
+            ("OK", [b"123 124"]),  # 2. After the EXISTS push (Found new!)
+        ])
 
-        mock_imap.search = AsyncMock(side_effect=[
-            ("OK", [b""]),  # 1. INBOX Init (snapshot)
-            ("OK", [b""]),  # 2. Junk Init (snapshot)
-            ("OK", [b"123"]),  # 3. INBOX Run (Found new!)
-            ("OK", [b""]),  # 4. Junk Run (No new)
+        # IDLE: the first push announces new mail, later waits never return
+        idle = asyncio.get_running_loop().create_future()
+        idle.set_result(None)
+        mock_imap.idle_start = AsyncMock(return_value=idle)
+        mock_imap.idle_done = MagicMock()
+        pushes = [[b"1 EXISTS"]]
+
+        async def wait_server_push():
+            if pushes:
+                return pushes.pop(0)
+            await asyncio.Event().wait()
+
+        mock_imap.wait_server_push = wait_server_push
+
+        # Mock fetch responses for the new email: structure + headers, then
+        # only the text/plain part (base64 encoded)
+        headers = b"From: sender@test.com\r\nSubject: Hello\r\n\r\n"
+        mock_imap.uid = AsyncMock(side_effect=[
+            ("OK", [
+                b'1 FETCH (UID 123 BODYSTRUCTURE (("text" "plain" ("charset" "utf-8") NIL NIL "base64" 16 1 NIL NIL NIL NIL)'
+                b'("application" "pdf" ("name" "offer.pdf") NIL NIL "base64" 90000 NIL NIL NIL NIL) "mixed" NIL NIL NIL)'
+                b' BODY[HEADER.FIELDS (SUBJECT FROM)] {%d}' % len(headers),
+                bytearray(headers),
+                b')',
+                b'2 FETCH (UID 124 BODYSTRUCTURE ("text" "plain" ("charset" "utf-8") NIL NIL "7bit" 6 1 NIL NIL NIL NIL)'
+                b' BODY[HEADER.FIELDS (SUBJECT FROM)] {%d}' % len(headers),
+                bytearray(headers),
+                b')',
+                b'Success',
+            ]),
+            ("OK", [
+                b'1 FETCH (UID 123 BODY[1] {16}', bytearray(b"RW1haWwgQm9keQ=="), b')',
+                b'2 FETCH (UID 124 BODY[1] {6}', bytearray(b"Second"), b')',
+                b'Success',
+            ]),
         ])
 
-        # Mock fetch response for the new email found in step 3
-        raw_email = b"From: sender@test.com\r\nSubject: Hello\r\n\r\nEmail Body"
-        mock_imap.fetch = AsyncMock(return_value=("OK", [None, raw_email]))
-
-        # Control the loop timing:
-        # 1st call: None (let loop continue to second pass)
-        # 2nd call: Raise CancelledError (stop test)
-        with patch("asyncio.sleep", side_effect=[None, asyncio.CancelledError()]):
-            events = []
-            try:
-                async for event in client.email_trigger():
-                    events.append(event)
-            except asyncio.CancelledError:
-                pass
-
-            # Now we should have found the email from pass 2
-            assert len(events) > 0
-            assert events[0]['subject'] == "Hello"
-            assert events[0]['sender'] == "sender@test.com"
\ No newline at end of file
+        trigger = client.email_trigger()
+        event = await asyncio.wait_for(trigger.__anext__(), timeout=1)
+        second = await asyncio.wait_for(trigger.__anext__(), timeout=1)
+        await trigger.aclose()
+
+        assert event['subject'] == "Hello"
+        assert event['sender'] == "sender@test.com"
+        assert event['body'] == "Email Body"
+        mock_imap.idle_done.assert_called()
+        # Only UIDs above the snapshot are searched for and fetched
+        assert mock_imap.uid_search.call_args_list[1][0] == ("UID 123:*",)
+        assert second['body'] == "Second"
+        # Both messages share one FETCH per step
+        assert mock_imap.uid.call_count == 2
+        assert mock_imap.uid.call_args_list[0][0][1] == "123:124"
+        assert mock_imap.uid.call_args_list[1][0] == ("fetch", "123:124", "(BODY.PEEK[1])")
+
+
+@pytest.mark.asyncio
+async def test_poll_checks_uidnext_before_searching():
+    client = EmailClient()
+    mock_imap = MagicMock()
+    mock_imap.status = AsyncMock(side_effect=[
+        ("OK", [b'INBOX (UIDNEXT 123)', b'STATUS completed']),
+        ("OK", [b'INBOX (UIDNEXT 125)', b'STATUS completed']),
+        ("NO", [b'STATUS not allowed']),
+    ])
+
+    assert not await client._uid_next_moved(mock_imap, "INBOX", 122)
+    assert await client._uid_next_moved(mock_imap, "INBOX", 122)
+    # Unusable answers fall back to searching
+    assert await client._uid_next_moved(mock_imap, "INBOX", 122)
+    assert mock_imap.status.call_args[0] == ("INBOX", "(UIDNEXT)")
+
+
+@pytest.mark.asyncio
+async def test_email_trigger_raises_when_all_watchers_stop():
+    client = EmailClient()
+    client.email_address = "user@test.com"
+    client.password = "pass"
+
+    async def stopped_watcher(folder, queue, poll_interval):
+        return None
+
+    with patch.object(client, "_watch_folder", side_effect=stopped_watcher):
+        with pytest.raises(RuntimeError, match="watchers have stopped"):
+            await asyncio.wait_for(anext(client.email_trigger()), timeout=1)
+
+
+def test_decode_part_falls_back_on_unknown_charset():
+    assert _decode_part(b"Price is 100", "7bit", "x-unknown-charset") == "Price is 100"
+
+
+@pytest.mark.asyncio
+async def test_watch_folder_retries_refused_select():
+    client = EmailClient()
+    client.email_address = "user@test.com"
+    client.password = "pass"
+
+    with patch("aioimaplib.IMAP4_SSL") as mock_imap_cls, \
+            patch("email_client.asyncio.sleep", AsyncMock(side_effect=asyncio.CancelledError)) as mock_sleep:
+        mock_imap = mock_imap_cls.return_value
+        mock_imap.wait_hello_from_server = AsyncMock()
+        mock_imap.login = AsyncMock()
+        mock_imap.logout = AsyncMock()
+        mock_imap.select = AsyncMock(return_value=("NO", [b"Server busy"]))
+
+        # A plain refusal goes to the reconnect back-off instead of returning
+        with pytest.raises(asyncio.CancelledError):
+            await client._watch_folder("INBOX", asyncio.Queue(), 2)
+        mock_sleep.assert_awaited_once_with(5)
+
+        # Only a folder the server says does not exist is given up on
+        mock_imap.select.return_value = ("NO", [b"[NONEXISTENT] Unknown mailbox"])
+        assert await client._watch_folder("Junk E-mail", asyncio.Queue(), 2) is None
+
+
+def test_parse_fetch_response_keeps_quoted_parens_as_strings():
+    items = _parse_fetch_response([
+        b'1 FETCH (UID 7 BODYSTRUCTURE (("text" "plain" ("charset" "utf-8") NIL NIL "7bit" 5 1 NIL NIL NIL NIL)'
+        b'("application" "pdf" ("name" ")") NIL NIL "base64" 10 NIL ("attachment" ("filename" "(")) NIL NIL)'
+        b' "mixed" NIL NIL NIL))',
+    ])
+
+    assert items["UID"] == b"7"
+    assert items["BODYSTRUCTURE"][1][2] == [b"name", b")"]
+    assert _find_text_part(items["BODYSTRUCTURE"]) == ("1", "7bit", "utf-8")
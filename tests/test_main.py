@@ -9,7 +9,7 @@ from tests.conftest import MockRecord
 def client(mock_db_pool):
     # Patch 'main.get_pool' so direct calls in endpoints return our mock pool
     # Patch 'asyncpg.create_pool' so the lifespan startup doesn't try to connect to real DB
-    with patch("main.get_pool", new_callable=AsyncMock) as mock_get_pool, \
+    with patch("main.get_pool") as mock_get_pool, \
             patch("asyncpg.create_pool", new_callable=AsyncMock) as mock_create_pool:
         mock_get_pool.return_value = mock_db_pool
         mock_create_pool.return_value = mock_db_pool  # Lifespan will get this mock
@@ -27,9 +27,9 @@ def test_health(client):
 @pytest.mark.asyncio
 async def test_suppliers_endpoint(client, mock_db_pool):
     # Setup mock return data
-    mock_db_pool.fetch.return_value = [
-        MockRecord(supplier_id="1", supplier_name="ACME", description="desc")
-    ]
+    mock_db_pool.fetchval.return_value = (
+        '[{"supplier_id" : "1", "supplier_name" : "ACME", "description" : "desc"}]'
+    )
 
     response = client.get("/suppliers")
 
@@ -37,20 +37,38 @@ async def test_suppliers_endpoint(client, mock_db_pool):
     data = response.json()
     assert len(data) == 1
     assert data[0]["supplier_name"] == "ACME"
+    assert "json_agg" in mock_db_pool.fetchval.call_args[0][0]
+
+    # Later requests are served from the snapshot; a matching ETag gets a 304
+    cached = client.get("/suppliers", headers={"If-None-Match": response.headers["etag"]})
+    assert cached.status_code == 304
+    mock_db_pool.fetchval.assert_called_once()
+
+
+SUP_1 = "11111111-1111-4111-8111-111111111111"
+SUP_2 = "22222222-2222-4222-8222-222222222222"
 
 
 @pytest.mark.asyncio
 async def test_negotiate_start(client, mock_db_pool):
-    with patch("main.OrchestratorAgent") as MockOrch, \
-            patch("main.NegotiationSession") as MockSession, \
-            patch("main.NegotiationAgent") as MockAgent:
+    # Autospec the real classes so only their declared methods (with matching
+    # signatures) exist on the stand-ins
+    with patch("main.OrchestratorAgent", autospec=True) as MockOrch, \
+            patch("main.NegotiationSession", autospec=True) as MockSession, \
+            patch("main.NegotiationAgent", autospec=True) as MockAgent:
         mock_db_pool.execute.return_value = None
+        mock_db_pool.fetch.return_value = [
+            MockRecord(supplier_id=SUP_1, supplier_name="ACME", supplier_email="a@acme.test", insights=""),
+            MockRecord(supplier_id=SUP_2, supplier_name="Globex", supplier_email=None, insights=None),
+        ]
+        MockAgent.return_value.send_initial_message.return_value = "Hello"
 
         payload = {
             "product": "Widgets",
             "prompt": "Buy cheap",
             "tactics": "Aggressive",
-            "suppliers": ["sup-1", "sup-2"]
+            # Non-canonical spellings still match the stored suppliers
+            "suppliers": [SUP_1.upper(), "{" + SUP_2.replace("-", "") + "}"]
         }
 
         response = client.post("/negotiate", json=payload)
@@ -59,4 +77,56 @@ async def test_negotiate_start(client, mock_db_pool):
         data = response.json()
         assert data["status"] == "started"
         assert "negotiation_id" in data
-        assert MockAgent.call_count == 2
\ No newline at end of file
+        assert MockAgent.call_count == 2
+        assert MockAgent.return_value.send_initial_message.await_count == 2
+        # Suppliers are loaded in one query, agent rows written in one batch
+        assert mock_db_pool.fetch.call_args[0][1] == [SUP_1, SUP_2]
+        mock_db_pool.executemany.assert_called_once()
+        assert [row[1] for row in mock_db_pool.executemany.call_args[0][1]] == [SUP_1, SUP_2]
+
+
+def test_negotiate_rejects_invalid_supplier_id(client, mock_db_pool):
+    payload = {"product": "Widgets", "prompt": "Buy cheap", "tactics": "Aggressive", "suppliers": ["sup-1"]}
+
+    response = client.post("/negotiate", json=payload)
+
+    assert response.status_code == 422
+    mock_db_pool.execute.assert_not_called()
+
+
+def test_negotiation_status(client, mock_db_pool):
+    mock_db_pool.fetchval.return_value = (
+        '{"negotiation_id" : "ng-1", "all_completed" : false, "agents" : '
+        '[{"supplier_id" : "sup-1", "supplier_name" : "ACME", "message_count" : 3, "completed" : true}]}'
+    )
+
+    response = client.get("/negotiation_status/ng-1")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["all_completed"] is False
+    assert data["agents"][0]["message_count"] == 3
+    # Counts and the overall flag come from a single aggregated query
+    mock_db_pool.fetchval.assert_called_once()
+    assert "bool_and(completed)" in mock_db_pool.fetchval.call_args[0][0]
+
+
+def test_orchestrator_activity_returns_server_side_json(client, mock_db_pool):
+    payload = '{"negotiation_id" : "ng-1", "count" : 0, "activities" : []}'
+    mock_db_pool.fetchval.return_value = payload
+
+    response = client.get("/orchestrator_activity/ng-1", params={"supplier_id": "sup-1"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == {"negotiation_id": "ng-1", "count": 0, "activities": []}
+    assert mock_db_pool.fetchval.call_args[0][1:] == ("ng-1", "sup-1")
+
+
+def test_orchestrator_activity_treats_empty_supplier_as_unfiltered(client, mock_db_pool):
+    mock_db_pool.fetchval.return_value = '{"negotiation_id" : "ng-1", "count" : 0, "activities" : []}'
+
+    response = client.get("/orchestrator_activity/ng-1", params={"supplier_id": ""})
+
+    assert response.status_code == 200
+    assert mock_db_pool.fetchval.call_args[0][1:] == ("ng-1", None)
@@ -1,7 +1,9 @@
 import pytest
 import asyncio
+from types import SimpleNamespace
 from unittest.mock import AsyncMock, MagicMock
-from router import EmailEventRouter, EmailEvent, NegotiationSession
+from router import INSERT_SUPPLIER_MESSAGE_SQL, EmailEventRouter, EmailEvent, NegotiationSession
+from tests.conftest import AsyncSpy
 
 
 @pytest.mark.asyncio
@@ -18,11 +20,9 @@ async def test_router_registration_and_push():
     # Create event
     event = EmailEvent(sender="test@test.com", subject="Hi", body="Hello", ng_id=ng_id, supplier_id=sup_id)
 
-    # Push event
-    await router.push(event)
-
-    # Allow async task to run
-    await asyncio.sleep(0.01)
+    # Push event and wait for the handler task it spawned
+    task = await router.push(event)
+    await task
 
     mock_handler.assert_called_once_with(event)
 
@@ -36,31 +36,29 @@ async def test_router_default_handler():
     # Event with no matching ID
     event = EmailEvent(sender="test@test.com", subject="Hi", body="Hello")
 
-    await router.push(event)
-    await asyncio.sleep(0.01)
+    await (await router.push(event))
 
     mock_default.assert_called_once_with(event)
 
 
 @pytest.mark.asyncio
 async def test_negotiation_session_flow(mock_db_pool):
-    # Setup
-    client = MagicMock()
-    orchestrator = AsyncMock()
-    orchestrator.generate_new_instructions = AsyncMock()
+    # Setup: the session only stores the client, so a sentinel is enough
+    client = object()
+    orchestrator = SimpleNamespace(generate_new_instructions=AsyncSpy({"sup-1": False}))
 
     router = EmailEventRouter()
     session = NegotiationSession(mock_db_pool, client, "ng-1", orchestrator, router)
 
     # Mock Agent
-    agent = AsyncMock()
-    agent.send_message = AsyncMock()
+    agent = SimpleNamespace(send_message=AsyncSpy())
     session.add_agent("sup-1", agent)
 
     # Simulate routing logic manually triggering the handler created by session
     # We need to find the handler the session registered
-    key = "ng-1:sup-1"
+    key = ("ng-1", "sup-1")
     handler = router._handlers[key]
+    assert handler == session._handle_event
 
     event = EmailEvent(sender="sup@ex.com", subject="Offer", body="Price is 100", ng_id="ng-1", supplier_id="sup-1")
 
@@ -68,17 +66,95 @@ async def test_negotiation_session_flow(mock_db_pool):
 
     # Assertions
     # 1. DB Inserted message
-    mock_db_pool.execute.assert_called()
-    args = mock_db_pool.execute.call_args_list[0]
-    assert "INSERT INTO message" in args[0][0]
-    assert "Price is 100" in args[0]
+    mock_db_pool.executemany.assert_called_once()
+    sql, rows = mock_db_pool.executemany.call_args[0]
+    assert sql is INSERT_SUPPLIER_MESSAGE_SQL
+    assert rows == [("ng-1", "sup-1", "supplier", "Price is 100")]
 
     # 2. Orchestrator called
-    orchestrator.generate_new_instructions.assert_called_once()
+    assert len(orchestrator.generate_new_instructions.calls) == 1
 
     # 3. Agent responded
-    agent.send_message.assert_called_once()
+    assert len(agent.send_message.calls) == 1
 
     # Cleanup
     session.cleanup()
-    assert key not in router._handlers
\ No newline at end of file
+    assert key not in router._handlers
+
+
+@pytest.mark.asyncio
+async def test_negotiation_session_batches_email_bursts(mock_db_pool):
+    orchestrator = SimpleNamespace(generate_new_instructions=AsyncSpy({"sup-1": False, "sup-2": True}))
+
+    router = EmailEventRouter()
+    session = NegotiationSession(mock_db_pool, object(), "ng-1", orchestrator, router)
+    agents = {sup: SimpleNamespace(send_message=AsyncSpy()) for sup in ("sup-1", "sup-2")}
+    for sup, agent in agents.items():
+        session.add_agent(sup, agent)
+    # One shared handler object for every supplier of the session
+    assert router._handlers["ng-1", "sup-1"] is router._handlers["ng-1", "sup-2"]
+
+    events = [
+        ("sup-1", EmailEvent(sender="a@ex.com", subject="Offer", body="100", ng_id="ng-1", supplier_id="sup-1")),
+        ("sup-1", EmailEvent(sender="a@ex.com", subject="Offer", body="95", ng_id="ng-1", supplier_id="sup-1")),
+        ("sup-2", EmailEvent(sender="b@ex.com", subject="Final", body="90", ng_id="ng-1", supplier_id="sup-2")),
+    ]
+    await asyncio.gather(*(router._handlers["ng-1", sup](event) for sup, event in events))
+
+    # One insert and one orchestrator pass for the whole burst
+    mock_db_pool.executemany.assert_called_once()
+    assert [row[3] for row in mock_db_pool.executemany.call_args[0][1]] == ["100", "95", "90"]
+    assert len(orchestrator.generate_new_instructions.calls) == 1
+    # One reply per supplier that is still negotiating
+    assert len(agents["sup-1"].send_message.calls) == 1
+    assert agents["sup-2"].send_message.calls == []
+
+
+@pytest.mark.asyncio
+async def test_router_caps_concurrent_handlers(monkeypatch):
+    monkeypatch.setattr("router.MAX_CONCURRENT_HANDLERS", 1)
+    router = EmailEventRouter()
+    release = asyncio.Event()
+    started = []
+
+    async def slow_handler(event):
+        started.append(event.body)
+        await release.wait()
+
+    router.set_default_handler(slow_handler)
+    first = await router.push(EmailEvent(sender="a", subject="s", body="first"))
+    second = asyncio.create_task(router.push(EmailEvent(sender="a", subject="s", body="second")))
+    await asyncio.sleep(0)
+
+    # The second push waits until the first handler finishes
+    assert started == ["first"]
+    assert not second.done()
+
+    release.set()
+    await first
+    await (await second)
+    assert started == ["first", "second"]
+
+
+@pytest.mark.asyncio
+async def test_router_drops_unmatched_event_without_default():
+    router = EmailEventRouter()
+    router._slots = MagicMock()
+
+    task = await router.push(EmailEvent(sender="a", subject="s", body="b", ng_id="ng-1", supplier_id="sup-1"))
+
+    # Nothing is scheduled for an event nobody handles
+    assert task is None
+    router._slots.acquire.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_negotiation_session_ignores_event_without_agent(mock_db_pool):
+    orchestrator = SimpleNamespace(generate_new_instructions=AsyncSpy({}))
+    session = NegotiationSession(mock_db_pool, object(), "ng-1", orchestrator, EmailEventRouter())
+
+    event = EmailEvent(sender="x@ex.com", subject="Offer", body="100", ng_id="ng-1", supplier_id="sup-9")
+    await session._handle_event(event)
+
+    mock_db_pool.executemany.assert_not_called()
+    assert orchestrator.generate_new_instructions.calls == []